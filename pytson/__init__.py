@@ -1,7 +1,10 @@
 # Import functions from all modules
 from pytson.serializer import Serializer, SerializerIt, SerializerJsonIterator
 from pytson.deserializer import DeSerializer
-from .pytson import encodeTSON, decodeTSON
+from pytson.lazy import LazyTsonDocument
+from pytson.stream import TsonStreamDecoder
+from pytson.stats import TsonStats
+from .pytson import encodeTSON, decodeTSON, iter_events, encode_many, iter_decode, tson_size, encode_into
 
 # Define version
 __version__ = "1.8.8"
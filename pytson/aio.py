@@ -0,0 +1,59 @@
+import asyncio
+
+from pytson.serializer import Serializer, SerializerJsonIterator
+from pytson.stream import TsonStreamDecoder
+
+# Bytes requested from the reader at a time
+READ_CHUNK_SIZE = 256 * 1024
+
+# Size of the chunks yielded when encoding
+ENCODE_CHUNK_SIZE = 64 * 1024
+
+
+# asyncio counterparts of SerializerJsonIterator and decodeTSON. Encoding
+# hands control back to the event loop between chunks, decoding feeds a
+# TsonStreamDecoder with large reads from an asyncio.StreamReader (or any
+# object with an async read(n) method).
+
+async def encode_async(obj, chunkSize=ENCODE_CHUNK_SIZE):
+    # Async iterator over the encoded document
+    if isinstance(obj, dict):
+        for chunk in SerializerJsonIterator(obj, chunkSize=chunkSize):
+            yield chunk
+            await asyncio.sleep(0)
+    else:
+        yield Serializer(obj).getBytes().getvalue()
+
+
+async def write_async(obj, writer, chunkSize=ENCODE_CHUNK_SIZE):
+    # Encodes obj to an asyncio.StreamWriter, respecting its flow control
+    async for chunk in encode_async(obj, chunkSize):
+        writer.write(chunk)
+        await writer.drain()
+
+
+async def iter_entries_async(reader, chunkSize=READ_CHUNK_SIZE):
+    # Async iterator over the (key, value) entries of the top-level map, each
+    # yielded as soon as it has been received
+    decoder = TsonStreamDecoder()
+
+    while not decoder.isDone():
+        data = await reader.read(chunkSize)
+        if len(data) == 0:
+            break
+
+        for entry in decoder.feed(data):
+            yield entry
+
+    for entry in decoder.close():
+        yield entry
+
+
+async def decode_async(reader, chunkSize=READ_CHUNK_SIZE):
+    entries = [entry async for entry in iter_entries_async(reader, chunkSize)]
+
+    # A document whose top level is not a map is a single entry without key
+    if len(entries) == 1 and entries[0][0] is None:
+        return entries[0][1]
+
+    return dict(entries)
@@ -0,0 +1,135 @@
+import io
+
+import numpy as np
+
+import pytson.spec as spec
+from pytson.serializer import Serializer, EncodedStringList, typed_list_dtypes
+from pytson.lazy import LazyTsonDocument
+from pytson.error import TsonError
+
+# pyarrow is optional, only needed by the functions of this module
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def checkArrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow conversion.")
+
+
+# Conversion of TSON values to Arrow arrays
+
+def to_arrow(value):
+    # Typed lists (numpy arrays) are wrapped without copying, string list
+    # blocks are converted in one vectorized pass (see string_block_to_arrow)
+    checkArrow()
+
+    if isinstance(value, np.ndarray) and value.ndim == 1:
+        arr = np.ascontiguousarray(value)
+        return pa.Array.from_buffers(pa.from_numpy_dtype(arr.dtype), len(arr), [None, pa.py_buffer(arr)])
+    elif isinstance(value, EncodedStringList):
+        return string_block_to_arrow(value)
+
+    return pa.array(value)
+
+
+def string_block_to_arrow(block):
+    # block holds n null terminated strings. The string data is the block
+    # without its terminators, and string i ends at its terminator position
+    # minus the i terminators before it.
+    checkArrow()
+
+    data = np.frombuffer(block, dtype=np.uint8)
+    nulls = np.flatnonzero(data == 0)
+    n = len(nulls)
+
+    large = len(data) - n > np.iinfo(np.int32).max
+    offsets = np.empty(n + 1, dtype=np.int64 if large else np.int32)
+    offsets[0] = 0
+    offsets[1:] = nulls - np.arange(n)
+
+    chars = data[data != 0]
+    return pa.Array.from_buffers(
+        pa.large_string() if large else pa.string(), n, [None, pa.py_buffer(offsets), pa.py_buffer(chars)]
+    )
+
+
+def read_table(source, columns=None):
+    # source is a buffer, a path or a binary file whose top level is a map of
+    # columns. Only the selected columns are decoded.
+    checkArrow()
+
+    if hasattr(source, "read"):
+        source = source.read()
+
+    doc = LazyTsonDocument(source)
+    if columns is None:
+        columns = list(doc)
+
+    arrays = []
+    for name in columns:
+        if doc.getType(name) == spec.LIST_STRING_TYPE:
+            arrays.append(string_block_to_arrow(doc.getStringListBlock(name)))
+        else:
+            arrays.append(to_arrow(doc[name]))
+
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+# Conversion of Arrow arrays to TSON values
+
+def from_arrow(array):
+    # Numeric arrays give numpy views of the Arrow buffer, string arrays an
+    # EncodedStringList built in one vectorized pass. Other types go through
+    # Python objects.
+    checkArrow()
+
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    if pa.types.is_floating(array.type) and array.null_count > 0:
+        array = array.fill_null(np.nan)
+
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        if array.null_count > 0:
+            raise TsonError("Null values are not supported in TSON string lists.")
+        return string_array_to_block(array)
+
+    if (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)) \
+            and np.dtype(array.type.to_pandas_dtype()).newbyteorder("<") in typed_list_dtypes.values():
+        if array.null_count > 0:
+            raise TsonError("Null values are not supported in TSON typed lists.")
+        return array.to_numpy(zero_copy_only=True)
+
+    return array.to_pylist()
+
+
+def string_array_to_block(array):
+    # Inserts a terminator after each string: the terminator of string i
+    # lands at its end offset plus the i terminators before it
+    n = len(array)
+    offsetType = np.int64 if pa.types.is_large_string(array.type) else np.int32
+
+    _, offsetBuffer, dataBuffer = array.buffers()
+    offsets = np.frombuffer(offsetBuffer, dtype=offsetType)[array.offset:array.offset + n + 1]
+    data = np.frombuffer(dataBuffer, dtype=np.uint8)[offsets[0]:offsets[-1]] if dataBuffer is not None else np.empty(0, np.uint8)
+
+    nulls = offsets[1:] - offsets[0] + np.arange(n)
+
+    block = np.zeros(len(data) + n, dtype=np.uint8)
+    isChar = np.ones(len(block), dtype=bool)
+    isChar[nulls] = False
+    block[isChar] = data
+
+    return EncodedStringList(block.tobytes())
+
+
+def write_table(table, con=None):
+    # Encodes a pyarrow Table as a map of columns. Returns con, a BytesIO by
+    # default.
+    checkArrow()
+
+    columns = {name: from_arrow(table.column(name)) for name in table.column_names}
+    return Serializer(columns, con or io.BytesIO()).getBytes()
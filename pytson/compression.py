@@ -0,0 +1,139 @@
+import bz2
+import lzma
+import zlib
+
+from pytson.error import TsonError
+
+# Compressed envelope: a codec byte followed by the compressed document. The
+# codec bytes are outside the TSON type codes, a plain document starts with
+# the STRING_TYPE of its version, so readers detect the envelope from the
+# first byte.
+ZLIB_TYPE = 200
+BZ2_TYPE = 201
+LZMA_TYPE = 202
+
+compression_types = {
+    "zlib": ZLIB_TYPE,
+    "bz2": BZ2_TYPE,
+    "lzma": LZMA_TYPE,
+}
+
+# Compressed bytes read at once by DecompressingReader
+COMPRESSED_READ_SIZE = 64 * 1024
+
+
+def getCompressionType(codec):
+    try:
+        return compression_types[codec]
+    except KeyError:
+        raise TsonError("Unknown compression " + str(codec) + ".")
+
+
+# level is the codec's compression level (preset for lzma), None for its
+# default
+def newCompressor(codec, level=None):
+    _type = getCompressionType(codec)
+
+    if _type == ZLIB_TYPE:
+        return zlib.compressobj(-1 if level is None else level)
+    elif _type == BZ2_TYPE:
+        return bz2.BZ2Compressor(9 if level is None else level)
+    else:
+        return lzma.LZMACompressor(preset=level)
+
+
+class Decompressor:
+    # Incremental decompressor of a codec byte, flush() returns what is left
+    # at the end of the stream
+    def __init__(self, _type):
+        self.type = _type
+        if _type == ZLIB_TYPE:
+            self.decompressor = zlib.decompressobj()
+        elif _type == BZ2_TYPE:
+            self.decompressor = bz2.BZ2Decompressor()
+        elif _type == LZMA_TYPE:
+            self.decompressor = lzma.LZMADecompressor()
+        else:
+            raise TsonError("Unknown compression type " + str(_type) + ".")
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data)
+
+    def flush(self):
+        if self.type == ZLIB_TYPE:
+            return self.decompressor.flush()
+        return b""
+
+
+def decompress(_type, data):
+    d = Decompressor(_type)
+    return d.decompress(data) + d.flush()
+
+
+class CompressedWriter:
+    # Binary stream compressing what is written to it into con, after the
+    # codec byte. finish() writes the end of the compressed stream, con is
+    # left open.
+    def __init__(self, con, codec="zlib", level=None):
+        self.con = con
+        self.compressor = newCompressor(codec, level)
+        self.con.write(bytes([getCompressionType(codec)]))
+
+    def write(self, data):
+        out = self.compressor.compress(data)
+        if len(out) > 0:
+            self.con.write(out)
+        return memoryview(data).nbytes
+
+    def finish(self):
+        self.con.write(self.compressor.flush())
+
+
+class DecompressingReader:
+    # Binary stream of the decompressed content of con, which is read and
+    # decompressed COMPRESSED_READ_SIZE bytes at a time. pending holds
+    # compressed bytes already taken from con.
+    def __init__(self, con, _type, pending=b""):
+        self.con = con
+        self.decompressor = Decompressor(_type)
+        self.buffer = bytearray(self.decompressor.decompress(pending))
+        self.eof = False
+
+    def read(self, n=-1):
+        while (n < 0 or len(self.buffer) < n) and not self.eof:
+            data = self.con.read(COMPRESSED_READ_SIZE)
+            if len(data) == 0:
+                self.eof = True
+                self.buffer += self.decompressor.flush()
+            else:
+                self.buffer += self.decompressor.decompress(data)
+
+        if n < 0 or n > len(self.buffer):
+            n = len(self.buffer)
+
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def seekable(self):
+        return False
+
+
+# Compresses the chunks of an iterator (e.g. a SerializerJsonIterator),
+# yielding the codec byte and then the compressed bytes as they are produced
+def compressChunks(chunks, codec="zlib", level=None):
+    compressor = newCompressor(codec, level)
+    yield bytes([getCompressionType(codec)])
+
+    # next() rather than a for loop, which would call iter() on chunks
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+
+        out = compressor.compress(chunk)
+        if len(out) > 0:
+            yield out
+
+    yield compressor.flush()
@@ -0,0 +1,61 @@
+import io
+
+from pytson.serializer import Serializer, FACTOR_LEVELS_KEY, FACTOR_CODES_KEY
+from pytson.lazy import LazyTsonDocument
+from pytson.error import TsonError
+
+# pandas is optional, only needed by the functions of this module
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def checkPandas():
+    if pd is None:
+        raise ImportError("pandas is required for DataFrame conversion.")
+
+
+# Tercen tables are TSON maps of column name -> column values
+
+def to_dataframe(source, columns=None):
+    # source is a buffer, a path or a binary file. Only the selected columns
+    # are decoded; numeric columns are wrapped without copying and factor
+    # columns become categorical.
+    checkPandas()
+
+    if hasattr(source, "read"):
+        source = source.read()
+
+    doc = LazyTsonDocument(source, factors="categorical")
+    if columns is None:
+        columns = list(doc)
+
+    return pd.DataFrame({name: doc[name] for name in columns}, columns=columns, copy=False)
+
+
+def from_dataframe(df, con=None, factors=False):
+    # Numeric columns are written from their numpy arrays, object columns
+    # from one tolist() pass. With factors=True, categorical columns of
+    # strings are written as factors from their codes and string columns
+    # with few distinct values are dictionary encoded. Returns con, a BytesIO
+    # by default.
+    checkPandas()
+
+    table = {}
+    for name in df.columns:
+        if not isinstance(name, str):
+            raise TsonError("Column name must be a String.")
+
+        col = df[name]
+        if col.dtype.kind in "iuf":
+            table[name] = col.to_numpy(copy=False)
+        elif factors and isinstance(col.dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(col.cat.categories):
+            table[name] = {
+                FACTOR_LEVELS_KEY: col.cat.categories.tolist(),
+                FACTOR_CODES_KEY: col.cat.codes.to_numpy(copy=False),
+            }
+        else:
+            table[name] = col.tolist()
+
+    return Serializer(table, con or io.BytesIO(), factors=factors).getBytes()
@@ -1,7 +1,10 @@
+import re
 import struct
 import numpy as np
 import pytson.spec as spec
-from pytson.error import TsonError
+from pytson.error import TsonError, TsonIncompleteError
+from pytson.serializer import FACTOR_LEVELS_KEY, FACTOR_CODES_KEY
+from pytson.compression import compression_types, decompress, DecompressingReader
 import sys
 
 
@@ -11,14 +14,72 @@ from io import BytesIO as StringIO
 
 
 int_struct = struct.Struct("<i")
+length_struct = struct.Struct("<I")
 double_struct = struct.Struct("<d")
 type_struct = struct.Struct("<B")
 
+null_re = re.compile(b"\x00")
+
+# Bytes read at once when looking for a string terminator in a seekable or
+# buffered stream
+STRING_READ_AHEAD = 64
+
+# Element type and size in bytes of each typed list
+typed_list_types = {
+    spec.LIST_UINT8_TYPE: (np.uint8, 1),
+    spec.LIST_UINT16_TYPE: (np.uint16, 2),
+    spec.LIST_UINT32_TYPE: (np.uint32, 4),
+    spec.LIST_INT8_TYPE: (np.int8, 1),
+    spec.LIST_INT16_TYPE: (np.int16, 2),
+    spec.LIST_INT32_TYPE: (np.int32, 4),
+    spec.LIST_INT64_TYPE: (np.int64, 8),
+    spec.LIST_UINT64_TYPE: (np.uint64, 8),
+    spec.LIST_FLOAT32_TYPE: (np.float32, 4),
+    spec.LIST_FLOAT64_TYPE: (np.float64, 8),
+}
+
+# Maximum size in bytes of the typed_array_chunk and string_list_chunk events
+EVENT_CHUNK_SIZE = 64 * 1024
+
+# Number of decoded map keys kept by DeSerializer, keyed by their UTF-8 bytes,
+# so that keys repeated across maps are decoded once and shared. Keys longer
+# than KEY_CACHE_MAX_LENGTH bytes are not cached.
+KEY_CACHE_SIZE = 1024
+KEY_CACHE_MAX_LENGTH = 64
+
+# Forms in which factors (see Serializer.addStringList) are returned, None
+# returns them as the map they are written as
+FACTOR_FORMS = (None, "tuple", "categorical", "list")
+
+# Payload size in bytes of each fixed size scalar
+scalar_sizes = {
+    spec.NULL_TYPE: 0,
+    spec.INTEGER_TYPE: 4,
+    spec.DOUBLE_TYPE: 8,
+    spec.BOOL_TYPE: 1,
+}
+
 
 class DeSerializer:
-    def __init__(self, con, mode = "old", chunk=8*1024):
+    # factors is the form of decoded factors: None (their map), "tuple"
+    # (codes, levels), "categorical" (pandas.Categorical) or "list" (the
+    # string list, None for missing codes)
+    #
+    # keyCacheSize is the number of map keys cached, the oldest is evicted
+    # when it is full; 0 disables the cache
+    #
+    # stats is an optional pytson.stats.TsonStats recording the decoding
+    def __init__(self, con, mode = "old", chunk=8*1024, decode=True, factors=None, keyCacheSize=KEY_CACHE_SIZE,
+                 stats=None):
+        if factors not in FACTOR_FORMS:
+            raise TsonError("Unknown factor form " + str(factors) + ".")
+
+        self.factors = factors
+        self.keyCache = {} if keyCacheSize > 0 else None
+        self.keyCacheSize = keyCacheSize
         self.byteChunk = bytes()
         self.chunkPointer = 0
+        self.pushback = b""
         self.chunkSize = chunk
         self.mode= mode
         if con is None:
@@ -29,6 +90,14 @@ class DeSerializer:
 
         self.con = con
 
+        if self.mode == "buffer":
+            self.setBuffer(con)
+
+        self.compression = self.readCompression()
+
+        if stats is not None:
+            stats.instrumentDeserializer(self)
+
         version = self.readObject()
 
         if version != spec.TSON_SPEC_VERSION:
@@ -36,17 +105,92 @@ class DeSerializer:
                 f"TSON version mismatch, found: {version}, expected : {spec.TSON_SPEC_VERSION}"
             )
 
-        
-        self.obj = self.readObject()
+        # With decode=False only the version is checked and the caller walks
+        # the document itself (see LazyTsonDocument)
+        self.obj = self.readObject() if decode else None
     
+    # con is any buffer (bytes, bytearray, memoryview, mmap) which is walked
+    # with an offset cursor instead of being read as a stream. Numeric lists
+    # are views into con, writable when con is, and a bytearray cannot be
+    # resized while they exist.
+    def setBuffer(self, con):
+        self.con = con
+        self.buffer = memoryview(con).cast("B")
+        self.bufferSize = self.buffer.nbytes
+        self.offset = 0
+
+    # Detects a compressed envelope (see pytson.compression) from the first
+    # byte and, if there is one, switches to reading its decompressed
+    # content: a buffer is decompressed at once, a stream incrementally, in
+    # chunks ("new" mode). Returns the compression type or None.
+    def readCompression(self):
+        if self.mode == "buffer":
+            if self.bufferSize == 0 or self.buffer[0] not in compression_types.values():
+                return None
+
+            _type = self.buffer[0]
+            self.setBuffer(decompress(_type, self.buffer[1:]))
+            return _type
+
+        con = self.con
+        seekable = getattr(con, "seekable", None)
+        consumed = False
+        if hasattr(con, "peek"):
+            first = con.peek(1)[:1]
+        elif self.mode == "new":
+            # The byte stays at the start of the chunk
+            self.read_new_chunk()
+            first = self.byteChunk[:1]
+        elif seekable is not None and seekable():
+            first = con.read(1)
+            con.seek(-len(first), 1)
+        else:
+            # The byte cannot be put back into the stream, read() serves it
+            # first, so that nothing past the document is read
+            first = con.read(1)
+            consumed = True
+
+        if len(first) == 0 or first[0] not in compression_types.values():
+            if consumed:
+                self.pushback = first
+            return None
+
+        _type = first[0]
+        if self.mode == "new" and len(self.byteChunk) > 0:
+            pending = self.byteChunk[1:]
+        else:
+            if not consumed:
+                con.read(1)
+            pending = b""
+
+        self.con = DecompressingReader(con, _type, pending)
+        self.byteChunk = bytes()
+        self.chunkPointer = 0
+        self.mode = "new"
+        return _type
+
     def read(self,  nRead):
         if self.mode == "old":
+            if self.pushback:
+                b = self.pushback
+                self.pushback = b""
+                return b + self.con.read(nRead - 1) if nRead > 1 else b
             return self.con.read(nRead)
+        elif self.mode == "buffer":
+            i1 = self.offset
+            i2 = self.offset + nRead
+
+            if i2 > self.bufferSize:
+                raise TsonIncompleteError("Unexpected end of TSON buffer.")
+
+            self.offset = i2
+
+            # Slicing a memoryview does not copy the underlying bytes
+            return self.buffer[i1:i2]
         else:
-            if (self.chunkPointer + nRead) > self.chunkSize or len(self.byteChunk) < nRead:
-                self.read_new_chunk()
+            if (self.chunkPointer + nRead) > len(self.byteChunk):
+                self.read_new_chunk(nRead)
 
-         
             i1 = self.chunkPointer
             i2 = self.chunkPointer + nRead 
             
@@ -56,8 +200,10 @@ class DeSerializer:
             
             return bts
         
-    def read_new_chunk(self):
-        self.byteChunk = self.byteChunk[self.chunkPointer:] + self.con.read(self.chunkSize)
+    def read_new_chunk(self, nRead=0):
+        # Large reads (e.g. a whole typed or string list) are fetched at once
+        # instead of being limited to chunkSize
+        self.byteChunk = self.byteChunk[self.chunkPointer:] + self.con.read(max(self.chunkSize, nRead))
         self.chunkPointer = 0
 
 
@@ -65,7 +211,7 @@ class DeSerializer:
         return type_struct.unpack(self.read(1))[0]
 
     def readLength(self):
-        _len = int_struct.unpack(self.read(4))[0]
+        _len = length_struct.unpack(self.read(4))[0]
         return _len
 
     # Add object
@@ -86,24 +232,8 @@ class DeSerializer:
             obj = self.readMap()
         elif _type == spec.LIST_STRING_TYPE:
             obj = self.readStringList()
-        elif _type == spec.LIST_UINT8_TYPE:
-            obj = self.readTypedNumList(np.uint8, 1)
-        elif _type == spec.LIST_UINT16_TYPE:
-            obj = self.readTypedNumList(np.uint16, 2)
-        elif _type == spec.LIST_UINT32_TYPE:
-            obj = self.readTypedNumList(np.uint32, 4)
-        elif _type == spec.LIST_INT8_TYPE:
-            obj = self.readTypedNumList(np.int8, 1)
-        elif _type == spec.LIST_INT16_TYPE:
-            obj = self.readTypedNumList(np.int16, 2)
-        elif _type == spec.LIST_INT32_TYPE:
-            obj = self.readTypedNumList(np.int32, 4)
-        elif _type == spec.LIST_INT64_TYPE:
-            obj = self.readTypedNumList(np.int64, 8)
-        elif _type == spec.LIST_FLOAT32_TYPE:
-            obj = self.readTypedNumList(np.float32, 4)
-        elif _type == spec.LIST_FLOAT64_TYPE:
-            obj = self.readTypedNumList(np.float64, 8)
+        elif _type in typed_list_types:
+            obj = self.readTypedNumList(*typed_list_types[_type])
         elif _type == spec.NULL_TYPE:
             obj = None
         else:
@@ -113,37 +243,112 @@ class DeSerializer:
 
     # Basic types (null, string, integer, double, bool)
 
+    def findNull(self, start):
+        if hasattr(self.con, "find"):
+            return self.con.find(b"\x00", start)
+
+        # memoryview has no find, the regex engine scans any buffer in place
+        m = null_re.search(self.buffer, start)
+        return -1 if m is None else m.start()
+
+    # Bytes of the next string, without its terminator
+    def readStringBytes(self):
+        if self.mode == "buffer":
+            start = self.offset
+            end = self.findNull(start)
+
+            if end < 0:
+                raise TsonIncompleteError("Unexpected end of TSON buffer.")
+
+            self.offset = end + 1
+
+            return self.buffer[start:end]
+        elif self.mode == "old":
+            seekable = getattr(self.con, "seekable", None)
+            if hasattr(self.con, "peek") and not self.pushback:
+                # Buffered stream: the terminator is located in the buffered
+                # bytes, which are then read up to it
+                r = []
+                while True:
+                    b = self.con.peek(STRING_READ_AHEAD)
+                    if len(b) == 0:
+                        raise TsonIncompleteError("Unexpected end of TSON stream.")
+
+                    end = b.find(b"\x00")
+                    if end >= 0:
+                        r.append(self.con.read(end + 1)[:-1])
+                        break
+
+                    r.append(self.con.read(len(b)))
+            elif seekable is not None and seekable():
+                # Read ahead a block, locate the terminator and seek back to
+                # just after it
+                r = []
+                while True:
+                    b = self.con.read(STRING_READ_AHEAD)
+                    if len(b) == 0:
+                        raise TsonIncompleteError("Unexpected end of TSON stream.")
+
+                    end = b.find(b"\x00")
+                    if end >= 0:
+                        r.append(b[:end])
+                        self.con.seek(end + 1 - len(b), 1)
+                        break
+
+                    r.append(b)
+            else:
+                r = []
+                while True:
+                    b = self.read(1)
+                    if b == b"\x00":
+                        break
+                    if len(b) == 0:
+                        raise TsonIncompleteError("Unexpected end of TSON stream.")
+
+                    r.append(b)
+
+            return b"".join(r)
+        else:
+            end = self.byteChunk.find(b"\x00", self.chunkPointer)
+            while end < 0:
+                nAvailable = len(self.byteChunk) - self.chunkPointer
+                self.read_new_chunk()
+                if len(self.byteChunk) == nAvailable:
+                    raise TsonIncompleteError("Unexpected end of TSON stream.")
+
+                end = self.byteChunk.find(b"\x00", nAvailable)
+
+            b = self.byteChunk[self.chunkPointer:end]
+            self.chunkPointer = end + 1
+
+            return b
+
     def readString(self):
-        r = []
-        if self.mode == "old":
-            bytesRead = 0
-            while True:
-                b = self.read(1)
-                # print(r, b)
-                if b == b"\x00":
-                    break
-                
-                
-                bytesRead = bytesRead + len(b)
-                r.append(b.decode("utf-8", errors="ignore"))
+        b = self.readStringBytes()
+        return [str(b, "utf-8", errors="ignore"), len(b) + 1]
 
-            
+    # Map key, a string looked up in the key cache by its bytes
+    def readKey(self):
+        if self.readType() != spec.STRING_TYPE:
+            raise TsonError("Key in map is not a string")
 
-            return ["".join(r), bytesRead+1]
-        else:
-            
-            while True:
-                b = self.read(1)
-                # print(r, b)
-                if b == b"\x00":
-                    break
-               
-            
-                r.append(b.decode("utf-8", errors="ignore"))
+        if self.keyCache is None:
+            return self.readString()[0]
+
+        b = self.readStringBytes()
+        if len(b) > KEY_CACHE_MAX_LENGTH:
+            return str(b, "utf-8", errors="ignore")
+
+        b = bytes(b)
+        k = self.keyCache.get(b)
+        if k is None:
+            if len(self.keyCache) >= self.keyCacheSize:
+                # dicts keep insertion order, the first key is the oldest
+                del self.keyCache[next(iter(self.keyCache))]
 
-            return ["".join(r), len(r)+1]
+            k = self.keyCache[b] = str(b, "utf-8", errors="ignore")
 
-        # return "".join([x.decode("utf-8") for x in i])
+        return k
 
     def readInteger(self):
         return int_struct.unpack(self.read(4))[0]
@@ -171,37 +376,157 @@ class DeSerializer:
 
         if l > 0:
             for i in range(l):
-                k = self.readObject()
-                if not (isinstance(k, str)):
-                    raise TsonError("Key in map is not a string")
-
+                # The value is evaluated first in an assignment, so the key
+                # is read on its own
+                k = self.readKey()
                 _d[k] = self.readObject()
 
+        if self.factors is not None and l == 2 and FACTOR_CODES_KEY in _d and FACTOR_LEVELS_KEY in _d:
+            return self.getFactor(_d[FACTOR_CODES_KEY], _d[FACTOR_LEVELS_KEY])
+
         return _d
 
+    def getFactor(self, codes, levels):
+        # Empty codes are written as an empty generic list
+        if not isinstance(codes, np.ndarray):
+            codes = np.asarray(codes, dtype=np.int64)
+
+        if self.factors == "tuple":
+            return (codes, levels)
+        elif self.factors == "categorical":
+            try:
+                import pandas as pd
+            except ImportError:
+                raise ImportError("pandas is required for categorical factors.")
+
+            return pd.Categorical.from_codes(codes, levels)
+        else:
+            # Code -1 (missing) picks the trailing None
+            levels = levels + [None]
+            return [levels[c] for c in codes.tolist()]
+
     def readTypedNumList(self, type, size):
         l = self.readLength()
         return np.frombuffer(self.read(size * l), dtype=type)
 
     def readStringList(self):
         l = self.readLength()
-        result = []
 
-        # _start = self.con.tell()
-        bytesRead = 0
+        if l == 0:
+            return []
+
+        # The list is a block of l bytes of null terminated strings, so it is
+        # read and decoded at once and split on the terminators. 0x00 never
+        # occurs inside a multi-byte UTF-8 sequence.
+        block = self.read(l)
+        return str(block, "utf-8", errors="ignore").split("\x00")[:-1]
+
+    # Events (SAX-style), yields (event, value) tuples for the next object
+    # without building it:
+    #   start_map (length), key, end_map
+    #   start_list (length), end_list
+    #   null, string, integer, double, bool
+    #   start_typed_array (numpy type, length), typed_array_chunk, end_typed_array
+    #   start_string_list (length in bytes), string_list_chunk, end_string_list
+    # Typed and string lists are yielded in chunks of at most chunkSize bytes.
+    def readEvents(self, chunkSize=EVENT_CHUNK_SIZE):
+        _type = self.readType()
 
-        if l > 0:
+        if _type == spec.BOOL_TYPE:
+            yield ("bool", self.readBool())
+        elif _type == spec.INTEGER_TYPE:
+            yield ("integer", self.readInteger())
+        elif _type == spec.DOUBLE_TYPE:
+            yield ("double", self.readDouble())
+        elif _type == spec.STRING_TYPE:
+            yield ("string", self.readString()[0])
+        elif _type == spec.NULL_TYPE:
+            yield ("null", None)
+        elif _type == spec.LIST_TYPE:
+            l = self.readLength()
+            yield ("start_list", l)
+            for _ in range(l):
+                yield from self.readEvents(chunkSize)
+            yield ("end_list", None)
+        elif _type == spec.MAP_TYPE:
+            l = self.readLength()
+            yield ("start_map", l)
             for _ in range(l):
-                # if self.con.tell() >= (_start + l):
-                if bytesRead >=  l:
-                    break
+                yield ("key", self.readKey())
+                yield from self.readEvents(chunkSize)
+            yield ("end_map", None)
+        elif _type in typed_list_types:
+            type, size = typed_list_types[_type]
+            l = self.readLength()
+            yield ("start_typed_array", (type, l))
+
+            n = max(1, chunkSize // size)
+            for i in range(0, l, n):
+                yield ("typed_array_chunk", np.frombuffer(self.read(size * min(n, l - i)), dtype=type))
+            yield ("end_typed_array", None)
+        elif _type == spec.LIST_STRING_TYPE:
+            l = self.readLength()
+            yield ("start_string_list", l)
 
-                readRes = self.readString()
-                # result.append(self.readString())
-                result.append(readRes[0])
-                bytesRead = bytesRead + readRes[1]
+            # A string cut at the end of a piece is carried over to the next
+            rest = b""
+            bytesRead = 0
+            while bytesRead < l:
+                n = min(chunkSize, l - bytesRead)
+                piece = rest + bytes(self.read(n))
+                bytesRead += n
+
+                end = piece.rfind(b"\x00") + 1
+                rest = piece[end:]
+                if end > 0:
+                    yield ("string_list_chunk", str(piece[:end], "utf-8", errors="ignore").split("\x00")[:-1])
+            yield ("end_string_list", None)
+        else:
+            raise ValueError("List type not found.")
 
-        return result
+    # Skip objects without decoding them
+    def skipString(self):
+        if self.mode == "buffer":
+            end = self.findNull(self.offset)
+
+            if end < 0:
+                raise TsonIncompleteError("Unexpected end of TSON buffer.")
+
+            self.offset = end + 1
+        else:
+            self.readString()
+
+    # Moves past the next object and returns its type code and length
+    # (number of elements, or bytes for a string list)
+    def skipObject(self):
+        _type = self.readType()
+        l = 0
+
+        if _type in scalar_sizes:
+            self.read(scalar_sizes[_type])
+        elif _type == spec.STRING_TYPE:
+            self.skipString()
+        elif _type in typed_list_types:
+            l = self.readLength()
+            self.read(typed_list_types[_type][1] * l)
+        elif _type == spec.LIST_STRING_TYPE:
+            l = self.readLength()
+            self.read(l)
+        elif _type == spec.LIST_TYPE:
+            l = self.readLength()
+            for _ in range(l):
+                self.skipObject()
+        elif _type == spec.MAP_TYPE:
+            l = self.readLength()
+            for _ in range(l):
+                if self.readType() != spec.STRING_TYPE:
+                    raise TsonError("Key in map is not a string")
+                self.skipString()
+                self.skipObject()
+        else:
+            raise ValueError("List type not found.")
+
+        return _type, l
 
     def getObject(self):
         return self.obj
\ No newline at end of file
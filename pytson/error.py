@@ -1,2 +1,7 @@
 class TsonError(Exception):
     ...
+
+
+class TsonIncompleteError(TsonError):
+    # Raised when the data ends in the middle of an object
+    ...
@@ -1,47 +1,231 @@
+import argparse
+import io
 import json
-import timeit
-from pytson import decodeTSON
-import cProfile, pstats, io
+import platform
+import sys
+import time
+import tracemalloc
 
-json_file = "pytson/tests/test_data.json"
-tson_file = "pytson/tests/test_data.tson"
+import numpy as np
 
+import pytson
+from pytson import Serializer, SerializerJsonIterator, DeSerializer, encodeTSON, decodeTSON
 
-def profile(fnc):
-    def inner(*args, **kwargs):
+# Benchmark suite: synthetic documents encoded and decoded by each code path,
+# reported as throughput (MB/s of TSON, objects/s) and peak traced memory.
+#
+#   python pytson/examples/benchmark.py
+#   python pytson/examples/benchmark.py --save baseline.json
+#   python pytson/examples/benchmark.py --baseline baseline.json
+#
+# With --baseline, a case whose throughput dropped by more than --tolerance
+# is reported as a regression and the exit status is 1.
 
-        pr = cProfile.Profile()
-        pr.enable()
-        retval = fnc(*args, **kwargs)
-        pr.disable()
-        s = io.StringIO()
-        sortby = "cumulative"
-        ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-        ps.print_stats()
-        print(s.getvalue())
-        return retval
 
-    return inner
+# Datasets, each a list of documents (top-level maps) and the number of
+# objects (scalars, strings and list elements) they hold
 
+def wide_numeric(scale):
+    rows = 250000 * scale
+    rng = np.random.default_rng(0)
+    doc = {}
+    for i in range(20):
+        if i % 2 == 0:
+            doc["f" + str(i)] = rng.random(rows)
+        else:
+            doc["i" + str(i)] = rng.integers(0, 1 << 30, rows, dtype=np.int32)
+    return [doc], 20 * rows
 
-j = open(json_file, "r")
 
+def string_columns(scale):
+    rows = 100000 * scale
+    doc = {
+        "ids": ["id_" + str(i) for i in range(rows)],
+        "samples": ["sample_" + str(i % 200) for i in range(rows)],
+        "names": ["gène-" + str(i * 7919 % 100003) for i in range(rows)],
+    }
+    return [doc], 3 * rows
 
-def load_json():
-    j.seek(0)
-    json.load(j)
 
+def nested_maps(scale):
+    def node(depth):
+        if depth == 0:
+            return {"id": 1, "value": 0.5, "name": "leaf", "flag": True, "missing": None}
+        return {"level": depth, "children": [node(depth - 1) for _ in range(4)], "meta": {"depth": depth}}
+
+    # 4**6 leaves of 5 objects, plus 3 objects per inner node
+    docs = [node(6) for _ in range(scale)]
+    inner = sum(4 ** d for d in range(6))
+    return docs, scale * (5 * 4 ** 6 + 3 * inner)
 
-t = open(tson_file, "rb")
 
+def small_messages(scale):
+    docs = [
+        {"id": i, "topic": "events", "value": i * 0.25, "ok": i % 2 == 0, "tags": ["a", "b"]}
+        for i in range(10000 * scale)
+    ]
+    return docs, 6 * len(docs)
 
-def load_tson():
-    t.seek(0)
-    decodeTSON(t)
 
+DATASETS = {
+    "wide_numeric": wide_numeric,
+    "string_columns": string_columns,
+    "nested_maps": nested_maps,
+    "small_messages": small_messages,
+}
 
-n10_json = timeit.timeit(load_json, number=10)
-n10_tson = timeit.timeit(load_tson, number=10)
 
-print(f"Timing for load_json: {n10_json}")
-print(f"Timing for load_tson: {n10_tson}")
+# Cases, each runs one code path over all documents. Encoders take the
+# documents, decoders their encodings.
+
+def serializer(docs, encoded):
+    for doc in docs:
+        Serializer(doc, io.BytesIO())
+
+
+def serializer_json_iterator(docs, encoded):
+    for doc in docs:
+        for _ in SerializerJsonIterator(doc, 64 * 1024):
+            pass
+
+
+def encode_tson(docs, encoded):
+    for doc in docs:
+        encodeTSON(doc)
+
+
+def deserializer_old(docs, encoded):
+    for data in encoded:
+        DeSerializer(io.BytesIO(data), mode="old").getObject()
+
+
+def deserializer_new(docs, encoded):
+    for data in encoded:
+        DeSerializer(io.BytesIO(data), mode="new").getObject()
+
+
+def decode_tson(docs, encoded):
+    for data in encoded:
+        decodeTSON(data)
+
+
+CASES = {
+    "Serializer": serializer,
+    "SerializerJsonIterator": serializer_json_iterator,
+    "encodeTSON": encode_tson,
+    "DeSerializer.old": deserializer_old,
+    "DeSerializer.new": deserializer_new,
+    "decodeTSON": decode_tson,
+}
+
+
+def measure(case, docs, encoded, repeat):
+    # Best wall time of repeat runs, then one traced run for the peak memory
+    # (tracing slows the run down, so it is not timed)
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        case(docs, encoded)
+        best = min(best, time.perf_counter() - t)
+
+    tracemalloc.start()
+    case(docs, encoded)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def run(datasets, cases, scale, repeat):
+    results = {}
+    for dataName in datasets:
+        docs, nObjects = DATASETS[dataName](scale)
+        encoded = [encodeTSON(doc).getvalue() for doc in docs]
+        nBytes = sum(len(data) for data in encoded)
+
+        for caseName in cases:
+            seconds, peak = measure(CASES[caseName], docs, encoded, repeat)
+            name = dataName + "/" + caseName
+            results[name] = {
+                "seconds": seconds,
+                "mb_per_s": nBytes / seconds / 1e6,
+                "objects_per_s": nObjects / seconds,
+                "peak_mb": peak / 1e6,
+            }
+            report(name, results[name])
+
+    return results
+
+
+def report(name, r, change=None):
+    line = "{0:<45} {1:>9.3f}s {2:>9.1f} MB/s {3:>13,.0f} obj/s {4:>9.1f} MB peak".format(
+        name, r["seconds"], r["mb_per_s"], r["objects_per_s"], r["peak_mb"]
+    )
+    if change is not None:
+        line += " {0:>+7.1%}".format(change)
+    print(line)
+
+
+# Returns the names of the cases whose throughput dropped by more than
+# tolerance compared to the baseline
+def compare(results, baseline, tolerance):
+    print("\nCompared to baseline ({0}):".format(baseline["environment"]))
+
+    regressions = []
+    for name, r in results.items():
+        b = baseline["results"].get(name)
+        if b is None:
+            continue
+
+        change = r["mb_per_s"] / b["mb_per_s"] - 1
+        report(name, r, change)
+        if change < -tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TSON encode/decode benchmarks.")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the size of every dataset")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best is kept")
+    parser.add_argument("--save", help="writes the results to this JSON file")
+    parser.add_argument("--baseline", help="compares the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="throughput drop reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.datasets, args.cases, args.scale, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "environment": "pytson {0}, Python {1}, {2}".format(
+                        pytson.__version__, platform.python_version(), platform.platform()
+                    ),
+                    "scale": args.scale,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get("scale") != args.scale:
+            print("\nWarning: baseline was run with --scale {0}".format(baseline.get("scale")))
+
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print("\nRegressions: " + ", ".join(regressions))
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
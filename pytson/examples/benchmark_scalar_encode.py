@@ -0,0 +1,19 @@
+import timeit
+from pytson import encodeTSON
+
+# Scalar-heavy document: a list of small metadata maps
+rows = [
+    {"id": i, "name": "row" + str(i), "value": i * 0.5, "flag": i % 2 == 0, "missing": None, "tags": ["a", 1, 2.0]}
+    for i in range(20000)
+]
+n_scalars = len(rows) * 8
+
+
+def encode_rows():
+    encodeTSON(rows)
+
+
+n = 5
+t = timeit.timeit(encode_rows, number=n) / n
+
+print(f"Encoded {n_scalars} scalars in {t:.3f}s: {n_scalars / t:,.0f} scalars/s")
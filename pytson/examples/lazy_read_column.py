@@ -0,0 +1,16 @@
+from pytson import encodeTSON, LazyTsonDocument
+import numpy as np
+
+s = {
+    "x": np.arange(10, dtype=np.float64),
+    "y": np.arange(10, dtype=np.int32),
+    "labels": ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"],
+}
+
+tson_bytes = encodeTSON(s).getvalue()
+
+# Only the map structure is scanned, values are decoded on access
+doc = LazyTsonDocument(tson_bytes)
+
+print(list(doc))
+print(doc["labels"])
@@ -0,0 +1,153 @@
+import os
+from collections.abc import Mapping
+from mmap import mmap as MemoryMap, ACCESS_READ
+
+import numpy as np
+
+import pytson.spec as spec
+from pytson.serializer import Serializer
+from pytson.deserializer import DeSerializer
+from pytson.error import TsonError
+
+INDEX_FORMAT_VERSION = 1
+
+
+class LazyTsonDocument(Mapping):
+    # Read-only mapping over a TSON document whose top level is a map.
+    # The map is scanned once to record the offset of every value, and a
+    # value is only decoded when its key is accessed.
+    #
+    # source is a bytes-like object (bytes, bytearray, memoryview, mmap) or a
+    # path, which is mapped read-only.
+    #
+    # indexFile is an optional sidecar file holding the index. It is loaded
+    # when it matches the document, otherwise the document is scanned and the
+    # sidecar (re)written, so later opens skip the scan. It requires a path
+    # source, since the sidecar is matched on the size and modification time
+    # of the file.
+    #
+    # factors is the form of decoded factors, see DeSerializer.
+    def __init__(self, source, indexFile=None, factors=None):
+        self.mtime = 0
+        if isinstance(source, (bytes, bytearray, memoryview, MemoryMap)):
+            if indexFile is not None:
+                raise TsonError("An index file requires the document to be given as a path.")
+        else:
+            with open(source, "rb") as f:
+                self.mtime = os.fstat(f.fileno()).st_mtime_ns
+                source = MemoryMap(f.fileno(), 0, access=ACCESS_READ)
+
+        self.deserializer = DeSerializer(source, mode="buffer", decode=False, factors=factors)
+
+        self.index = None
+        if indexFile is not None:
+            self.index = self.loadIndex(indexFile)
+
+        if self.index is None:
+            self.index = self.scan()
+            if indexFile is not None:
+                self.saveIndex(indexFile)
+
+    # Builds the index: key -> (offset of the value, type code, length)
+    def scan(self):
+        ds = self.deserializer
+
+        if ds.readType() != spec.MAP_TYPE:
+            raise TsonError("Lazy access requires a map at the top level.")
+
+        index = {}
+        for _ in range(ds.readLength()):
+            k = ds.readObject()
+            if not (isinstance(k, str)):
+                raise TsonError("Key in map is not a string")
+
+            offset = ds.offset
+            _type, l = ds.skipObject()
+            index[k] = (offset, _type, l)
+
+        return index
+
+    # Sidecar index. It is itself a TSON map of columns (keys, offsets, types,
+    # lengths) plus the size and modification time of the indexed document.
+    def saveIndex(self, path):
+        entries = list(self.index.values())
+        idx = {
+            "format": INDEX_FORMAT_VERSION,
+            "document": np.array([self.deserializer.bufferSize, self.mtime], dtype=np.int64),
+            "keys": list(self.index.keys()),
+            "offsets": np.array([e[0] for e in entries], dtype=np.int64),
+            "types": np.array([e[1] for e in entries], dtype=np.uint8),
+            "lengths": np.array([e[2] for e in entries], dtype=np.int64),
+        }
+
+        # Written to a temporary file first so concurrent readers never see a
+        # partial index
+        tmpPath = "{0}.{1}.tmp".format(path, os.getpid())
+        try:
+            with open(tmpPath, "wb") as f:
+                Serializer(idx, f)
+            os.replace(tmpPath, path)
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+
+    # Returns the index stored in path, or None if it is missing, malformed
+    # or does not match the document
+    def loadIndex(self, path):
+        try:
+            with open(path, "rb") as f:
+                idx = DeSerializer(f.read(), mode="buffer").getObject()
+        except (OSError, TsonError, ValueError):
+            return None
+
+        if not isinstance(idx, dict) or idx.get("format") != INDEX_FORMAT_VERSION:
+            return None
+
+        try:
+            document = [int(v) for v in idx["document"]]
+            if document != [self.deserializer.bufferSize, self.mtime]:
+                return None
+
+            columns = [idx["keys"], idx["offsets"], idx["types"], idx["lengths"]]
+            if len(set(map(len, columns))) != 1:
+                return None
+
+            return {k: (int(o), int(t), int(l)) for k, o, t, l in zip(*columns)}
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    # Decodes the whole map
+    def decode(self):
+        return {k: self[k] for k in self.index}
+
+    def __getitem__(self, key):
+        ds = self.deserializer
+        ds.offset = self.index[key][0]
+        return ds.readObject()
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    # Raw block of a string list: its null terminated UTF-8 strings
+    def getStringListBlock(self, key):
+        offset, _type, l = self.index[key]
+        if _type != spec.LIST_STRING_TYPE:
+            raise TsonError("Value of " + key + " is not a string list.")
+
+        # type and length precede the block
+        start = offset + spec.TYPE_LENGTH_IN_BYTES + spec.ELEMENT_LENGTH_IN_BYTES
+        return self.deserializer.buffer[start:start + l]
+
+    def getType(self, key):
+        return self.index[key][1]
+
+    def getLength(self, key):
+        return self.index[key][2]
+
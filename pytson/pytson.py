@@ -1,12 +1,173 @@
-from .serializer import Serializer
-from .deserializer import DeSerializer
+from .serializer import Serializer, BufferSerializer, encodeObject, encodedSize, length_struct
+from .deserializer import DeSerializer, EVENT_CHUNK_SIZE
+from .error import TsonError, TsonIncompleteError
+from . import spec
+from .stats import TsonStats
+from .compression import CompressedWriter
+import builtins
 import io
-from typing import Any
+from mmap import mmap as MemoryMap, ACCESS_READ
+from typing import Any, Iterable, Iterator, Optional, Tuple
 
 
-def encodeTSON(obj: Any) -> io.BytesIO:
-    return Serializer(obj, io.BytesIO()).getBytes()
+def encodeTSON(obj: Any, factors: bool = False, stats: Optional[TsonStats] = None, compression: Optional[str] = None,
+               level: Optional[int] = None) -> io.BytesIO:
+    # factors dictionary encodes string lists with few distinct values, see
+    # Serializer.addStringList. stats records the encoding, see TsonStats.
+    #
+    # compression ("zlib", "bz2" or "lzma") writes a compressed envelope,
+    # compressed as the serializer writes; decodeTSON detects it.
+    con = io.BytesIO()
+    if compression is None:
+        return Serializer(obj, con, factors=factors, stats=stats).getBytes()
 
+    writer = CompressedWriter(con, compression, level)
+    Serializer(obj, writer, factors=factors, stats=stats)
+    writer.finish()
+    return con
 
-def decodeTSON(bytes) -> Any:
-    return DeSerializer(bytes).getObject()
+
+def decodeTSON(bytes, mmap: bool = False, factors: Optional[str] = None, stats: Optional[TsonStats] = None) -> Any:
+    # With mmap=True, bytes is a path or an open binary file which is mapped
+    # read-only; numeric lists are returned as views into the mapping
+    #
+    # Numeric lists decoded from bytes, a memoryview or an mmap are views
+    # into it. A bytearray is copied first: views into it would be writable
+    # aliases of the caller's buffer and would prevent resizing it.
+    #
+    # A compressed envelope is detected and decompressed, a buffer at once
+    # and a stream incrementally
+    #
+    # factors is the form of decoded factors, see DeSerializer
+    #
+    # stats records the decoding, see TsonStats
+    if isinstance(bytes, bytearray):
+        bytes = builtins.bytes(bytes)
+
+    if mmap:
+        if hasattr(bytes, "fileno"):
+            bytes = MemoryMap(bytes.fileno(), 0, access=ACCESS_READ)
+        else:
+            with open(bytes, "rb") as f:
+                bytes = MemoryMap(f.fileno(), 0, access=ACCESS_READ)
+
+    if isinstance(bytes, (builtins.bytes, bytearray, memoryview, MemoryMap)):
+        return DeSerializer(bytes, mode="buffer", factors=factors, stats=stats).getObject()
+
+    return DeSerializer(bytes, factors=factors, stats=stats).getObject()
+
+
+def iter_events(stream, chunkSize: int = EVENT_CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    # Yields (event, value) tuples for the document without building it,
+    # see DeSerializer.readEvents. stream is a binary stream or a buffer.
+    if isinstance(stream, (builtins.bytes, bytearray, memoryview, MemoryMap)):
+        ds = DeSerializer(stream, mode="buffer", decode=False)
+    else:
+        ds = DeSerializer(stream, mode="new", chunk=chunkSize, decode=False)
+
+    return ds.readEvents(chunkSize)
+
+
+# Record streams: many documents in one stream, as the version once followed
+# by records, each the uint32 length of an encoded object and that encoding.
+
+def encode_many(iterable: Iterable[Any], stream, factors: bool = False) -> int:
+    # Writes the objects of iterable to the binary stream, returns their
+    # number
+    stream.write(encodeObject(spec.TSON_SPEC_VERSION))
+
+    n = 0
+    for obj in iterable:
+        data = encodeObject(obj, factors)
+        stream.write(length_struct.pack(len(data)))
+        stream.write(data)
+        n += 1
+
+    return n
+
+
+def iter_decode(stream, factors: Optional[str] = None) -> Iterator[Any]:
+    # Yields the objects of a record stream, a binary stream or a buffer. The
+    # version is checked once and a single deserializer, with its key cache,
+    # decodes every record.
+    if isinstance(stream, (builtins.bytes, bytearray, memoryview, MemoryMap)):
+        ds = DeSerializer(stream, mode="buffer", decode=False, factors=factors)
+
+        while ds.offset < ds.bufferSize:
+            end = ds.readLength() + ds.offset
+            obj = ds.readObject()
+            if ds.offset != end:
+                raise TsonError("TSON record length does not match its content.")
+
+            yield obj
+        return
+
+    header = bytearray(stream.read(1))
+    while len(header) < 2 or header[-1] != 0:
+        b = stream.read(1)
+        if len(b) == 0:
+            raise TsonIncompleteError("Unexpected end of TSON record stream.")
+        header += b
+
+    ds = DeSerializer(bytes(header), mode="buffer", decode=False, factors=factors)
+
+    while True:
+        head = stream.read(spec.ELEMENT_LENGTH_IN_BYTES)
+        if len(head) == 0:
+            return
+
+        l = length_struct.unpack(head)[0] if len(head) == spec.ELEMENT_LENGTH_IN_BYTES else -1
+        data = stream.read(l) if l >= 0 else b""
+        if len(data) != l:
+            raise TsonIncompleteError("Unexpected end of TSON record stream.")
+
+        # Each record gets its own bytes, since typed lists are views into
+        # the buffer they are decoded from
+        ds.setBuffer(data)
+        obj = ds.readObject()
+        if ds.offset != l:
+            raise TsonError("TSON record length does not match its content.")
+
+        yield obj
+
+
+def tson_size(obj: Any, header: bool = True) -> int:
+    # Exact size in bytes of encodeTSON(obj), computed without encoding it.
+    # header=False leaves out the version.
+    size = encodedSize(obj)
+    if header:
+        size += encodedSize(spec.TSON_SPEC_VERSION)
+    return size
+
+
+def encode_into(obj: Any, buffer, offset: int = 0, header: bool = True) -> int:
+    # Encodes obj in place into buffer, a writable bytes-like object (a
+    # bytearray, mmap, shared memory buffer...), from offset. The size is
+    # computed first and the buffer is never resized. Returns the offset
+    # just after the encoding.
+    #
+    # The strings and lists encoded to find the size are kept until they are
+    # written, so each is encoded once, at the cost of holding their encoded
+    # form (up to the size of the encoding) in memory meanwhile.
+    encoded = {}
+    end = offset + encodedSize(obj, encoded)
+    if header:
+        end += encodedSize(spec.TSON_SPEC_VERSION)
+
+    target = memoryview(buffer).cast("B")
+    try:
+        if target.readonly:
+            raise TsonError("Buffer is not writable.")
+        if offset < 0 or end > target.nbytes:
+            raise TsonError(
+                "Buffer too small, {0} bytes are needed from offset {1}.".format(end - offset, offset)
+            )
+
+        serializer = BufferSerializer(obj, target, offset, header=header, encoded=encoded)
+        serializer.release()
+        if serializer.getOffset() != end:
+            raise TsonError("Encoded size does not match the computed size.")
+    finally:
+        target.release()
+
+    return end
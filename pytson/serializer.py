@@ -1,15 +1,14 @@
-import struct , math
+import struct
 import numpy as np
 import pytson.spec as spec
 from pytson.error import TsonError
+from pytson.compression import compressChunks
 #from line_profiler import profile
 
-import array
 #import string
 
 # support for py2.x and py3.x+
 # most likely we should just drop py2.x at all
-import io
 from io import BytesIO as StringIO
 
 STRING_LIST=0
@@ -17,260 +16,321 @@ NUMERIC_LIST=1
 MIXED_LIST=2
 MIXED_NUMERIC_LIST=3
 
+NUMERIC_TYPES = (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64, float,  np.float32, np.float64)
+
+# Precompiled structs, type codes are packed together with their payload
+type_struct = struct.Struct("<B")
+length_struct = struct.Struct("<I")
+head_struct = struct.Struct("<BI")
+integer_struct = struct.Struct("<Bi")
+double_struct = struct.Struct("<Bd")
+bool_struct = struct.Struct("<BB")
 
+NULL_BYTES = type_struct.pack(spec.NULL_TYPE)
+STRING_TYPE_BYTES = type_struct.pack(spec.STRING_TYPE)
+
+# Output buffered by Serializer is written to con once it reaches this size.
+# Typed lists and string list blocks at least this large are written to con
+# without being copied into the buffer.
+DIRECT_WRITE_SIZE = 64 * 1024
+
+# Strings of a string list encoded together, so that a large list is never
+# held encoded all at once
+STRING_BATCH_SIZE = 16 * 1024
+
+# Little-endian element dtype of each typed list
+typed_list_dtypes = {
+    spec.LIST_UINT8_TYPE: np.dtype("<u1"),
+    spec.LIST_UINT16_TYPE: np.dtype("<u2"),
+    spec.LIST_UINT32_TYPE: np.dtype("<u4"),
+    spec.LIST_INT8_TYPE: np.dtype("<i1"),
+    spec.LIST_INT16_TYPE: np.dtype("<i2"),
+    spec.LIST_INT32_TYPE: np.dtype("<i4"),
+    spec.LIST_INT64_TYPE: np.dtype("<i8"),
+    spec.LIST_UINT64_TYPE: np.dtype("<u8"),
+    spec.LIST_FLOAT32_TYPE: np.dtype("<f4"),
+    spec.LIST_FLOAT64_TYPE: np.dtype("<f8"),
+}
+
+typed_list_types = {dtype: type for type, dtype in typed_list_dtypes.items()}
+
+# Factor (dictionary encoded string list) written as a map of its unique
+# levels and the integer code of every element
+FACTOR_LEVELS_KEY = "@@LEVELS@@"
+FACTOR_CODES_KEY = "@@CODES@@"
+
+# String lists are written as factors when they have at least this many
+# elements and at most FACTOR_MAX_LEVEL_RATIO distinct values per element
+FACTOR_MIN_LENGTH = 16
+FACTOR_MAX_LEVEL_RATIO = 0.5
+
+
+
+class EncodedStringList(bytes):
+    # A string list already in its TSON form, the null terminated UTF-8
+    # strings one after the other. Written as it is by Serializer.
+    ...
+
+
+# The strings of obj encoded, each followed by its terminator, built in a
+# single join (the empty last part gives the final terminator)
+def joinStrings(obj):
+    parts = [x.encode("utf-8") for x in obj]
+    parts.append(b"")
+    return b"\x00".join(parts)
+
+
+def encodeStringList(obj):
+    # Each string is encoded once, the block length is taken from the
+    # joined result
+    return EncodedStringList(joinStrings(obj))
+
+
+def getListType(obj):
+    if len(obj) == 0:
+        return MIXED_LIST
+
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in "iuf":
+        return NUMERIC_LIST
+
+    # Classify on the set of element classes, collected in a single pass
+    types = set(map(type, obj))
+
+    if len(types) == 1:
+        t = types.pop()
+        if issubclass(t, str):
+            return STRING_LIST
+        elif issubclass(t, NUMERIC_TYPES):
+            return NUMERIC_LIST
+    elif all(issubclass(t, NUMERIC_TYPES) for t in types):
+        return MIXED_NUMERIC_LIST
+
+    return MIXED_LIST
+
+
+# Integer types tried, in order, for Python int lists
+integer_list_types = [
+    spec.LIST_INT8_TYPE,
+    spec.LIST_UINT8_TYPE,
+    spec.LIST_INT16_TYPE,
+    spec.LIST_UINT16_TYPE,
+    spec.LIST_INT32_TYPE,
+    spec.LIST_UINT32_TYPE,
+    spec.LIST_INT64_TYPE,
+    spec.LIST_UINT64_TYPE,
+]
+
+# Largest integer a double holds exactly
+MAX_EXACT_DOUBLE_INTEGER = 2**53
+
+
+# Typed list type of a numeric list, and the list as a contiguous
+# little-endian array of that type. Arrays use their dtype and are not copied
+# when already in that form. Lists use the type of their first element, where
+# Python floats map to float64 and Python ints to the smallest integer type
+# holding all values.
+def toTypedList(obj):
+    if isinstance(obj, np.ndarray):
+        dtype = obj.dtype
+    else:
+        t = type(obj[0])
+        if issubclass(t, float):
+            return spec.LIST_FLOAT64_TYPE, np.asarray(obj, dtype=typed_list_dtypes[spec.LIST_FLOAT64_TYPE])
+        elif issubclass(t, int):
+            return toIntegerList(obj)
+        dtype = np.dtype(t)
+
+    listType = typed_list_types.get(dtype.newbyteorder("<"))
+    if listType is None:
+        raise ValueError("List type " + str(dtype) + " not found.")
+
+    return listType, np.ascontiguousarray(obj, dtype=typed_list_dtypes[listType])
+
+
+def toIntegerList(obj):
+    try:
+        arr = np.asarray(obj)
+
+        # numpy falls back to float or object arrays for values above the
+        # int64 range, which still fit uint64 when none is negative
+        if arr.dtype.kind not in "iub" and min(obj) >= 0:
+            arr = np.asarray(obj, dtype=np.uint64)
+    except (OverflowError, TypeError):
+        arr = None
+
+    if arr is None or arr.dtype.kind not in "iub":
+        raise TsonError("Integer list does not fit a 64-bit integer list.")
+
+    lo, hi = (int(arr.min()), int(arr.max())) if len(arr) > 0 else (0, 0)
+
+    for listType in integer_list_types:
+        info = np.iinfo(typed_list_dtypes[listType])
+        if info.min <= lo and hi <= info.max:
+            return listType, arr.astype(typed_list_dtypes[listType])
+
+
+def packInteger(obj):
+    try:
+        return integer_struct.pack(spec.INTEGER_TYPE, obj)
+    except struct.error:
+        # Outside int32, written as a double as long as that is exact
+        if -MAX_EXACT_DOUBLE_INTEGER <= obj <= MAX_EXACT_DOUBLE_INTEGER:
+            return double_struct.pack(spec.DOUBLE_TYPE, obj)
+        raise TsonError("Integer " + str(obj) + " does not fit a TSON integer or double.")
 
 
 class SerializerIt:
     def addTsonSpec(self):
         self.addString(spec.TSON_SPEC_VERSION)
 
-    def __init__(self, con=io.BytesIO()):
-        self.con = con
+    def __init__(self):
+        # Pending output, emitted and cleared in chunks by
+        # SerializerJsonIterator. The bytearray keeps its allocation when the
+        # emitted bytes are removed from its front.
+        self.buffer = bytearray()
         self.numListType = None
-        self.null_pack = struct.pack("<B", spec.NULL_TYPE)
-        self.objLen = None
 
 
     def addType(self, spec_type):
-        self.con.write(struct.pack("<B", spec_type))
+        self.buffer += type_struct.pack(spec_type)
 
     def addLength(self, length):
         # to:do - check list length
-        self.con.write(struct.pack("<I", length))
-
-
-
-    def __listdtype(self, obj, typeList):
-        # Assumptions
-        #  1. List has been checked to ensure all ae of the same type
-        #  2. Values will only match one type within typeList
-        o = obj[0]
+        self.buffer += length_struct.pack(length)
 
-        typeCheck = [isinstance(o, t) for t in typeList ]
 
-        res = [i for i, val in enumerate(typeCheck) if val]
-        return typeList[res[0]]
-
-
-            
 
     # Basic types (null, string, integer, double, bool)
     def addNull(self):
-        self.addType(spec.NULL_TYPE)
-        return self.con.tell()
+        self.buffer += NULL_BYTES
+        return self.getSize()
 
     def addString(self, obj):
-        self.addType(spec.STRING_TYPE)
-        
-        self.con.write(struct.pack("{0}s".format(len(obj)), obj.encode("utf-8")))
-        self.addNull()
+        self.buffer += STRING_TYPE_BYTES
+        self.buffer += obj.encode("utf-8")
+        self.buffer += NULL_BYTES
 
-        return self.con.tell()
-    
+        return self.getSize()
 
-    # def addCString_deprecated(self, obj):
-    #     #struct.pack("<B", spec_type)
-    #     self.con.write(struct.pack("{0}s".format(len(obj)), obj.encode("utf-8")))
-    #     self.addNull()
-
-    #     return self.con.tell()
-    # Refactor of the function above for about 50% speed-up
-    # In addCString_deprecated, obj is a single string, whereas now it is a list of strings
-    # The lsit is packed into bytes + null termination byte and sent to the buffer once
+    # obj is a list of strings, packed into null terminated bytes and added
+    # to the buffer at once
     def addCString(self, obj):
-        self.con.write(b''.join( [struct.pack("{0}s".format(\
-            len(obj[int(c/2)])), obj[int(c/2)].encode("utf-8")  )\
-                  if c%2 == 0 else b"\x00" for c in range(0,len(obj)*2)]) )
-
-        #return self.con.tell()
+        self.buffer += b"\x00".join([x.encode("utf-8") for x in obj])
+        self.buffer += NULL_BYTES
 
     def addInteger(self, obj):
-        self.addType(spec.INTEGER_TYPE)
-        self.con.write(struct.pack("<i", obj))
-        return self.con.tell()
+        self.buffer += packInteger(obj)
+        return self.getSize()
 
     def addDouble(self, obj):
-        self.addType(spec.DOUBLE_TYPE)
-        self.con.write(struct.pack("<d", obj))
-        return self.con.tell()
+        self.buffer += double_struct.pack(spec.DOUBLE_TYPE, obj)
+        return self.getSize()
 
     def addBool(self, obj):
-        self.addType(spec.BOOL_TYPE)
-        self.con.write(struct.pack("<B", obj))
-        return self.con.tell()
+        self.buffer += bool_struct.pack(spec.BOOL_TYPE, obj)
+        return self.getSize()
 
     # Basic list
     def addListHead(self, l):
-        self.addType(spec.LIST_TYPE)
-        self.addLength(len(l))
+        self.buffer += head_struct.pack(spec.LIST_TYPE, len(l))
 
 
     # Basic map
     def addMapHead(self, m):
-        self.addType(spec.MAP_TYPE)
-        self.addLength(len(m))
+        self.buffer += head_struct.pack(spec.MAP_TYPE, len(m))
 
 
-    
     # Integer lists
     def addIntegerListHead(self, obj):
-        # __istype(self, obj, typeList):
-        dtype = self.__listdtype(obj,[float, np.float32, np.float64, int, np.int8, np.int16, 
-                    np.int32, np.int64, np.uint, np.uint8, 
-                    np.uint16, np.uint32, np.uint64] )
-
-
-
-        if dtype == np.dtype("int8"):
-            self.addTypedNumList(obj, type=spec.LIST_INT8_TYPE)
-            self.numListType = 1
-        elif dtype == np.dtype("uint8"):
-            self.addTypedNumList(obj, type=spec.LIST_UINT8_TYPE)
-        elif dtype == np.dtype("int16"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT16_TYPE)
-        elif dtype == np.dtype("uint16"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT16_TYPE)
-        elif dtype == np.dtype("int32")  or dtype == int:
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT32_TYPE)
-        elif dtype == np.dtype("uint32"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT32_TYPE)
-        elif dtype == np.dtype("int64"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT64_TYPE)
-        elif dtype == np.dtype("uint64"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT64_TYPE)
-        elif dtype == np.dtype("float32"):
-            self.numListType = 2
-            self.addTypedNumList(obj, type=spec.LIST_FLOAT32_TYPE)
-        elif dtype == np.dtype("float64") or dtype == float:
-            self.numListType = 2
-            self.addTypedNumList(obj, type=spec.LIST_FLOAT64_TYPE)
-        else:
-            raise ValueError("List type " + str(dtype) + " not found.")
-
-    def addTypedNumList(self, obj, type):
-        _l = len(obj)
-        self.addType(type)
-        self.addLength(_l)
+        # Returns the list as a contiguous little-endian array of its typed
+        # list type, numpy arrays already in that form are not copied
+        type, arr = toTypedList(obj)
 
-        # self.con.write(obj.tobytes())
+        self.buffer += head_struct.pack(type, len(arr))
 
+        return arr
 
-    
-    # #@profile
-    def addChunkedNumericArray(self, obj, chunkSize, currentWritten=0, startIndex=0):
-        bytesWritten = currentWritten
-
+    # Chunked arrays: elements from startIndex are added until the buffer
+    # holds chunkSize bytes. Returns the buffer size and the index of the
+    # next element, -1 once the array is complete.
+    def addChunkedBytes(self, data, chunkSize, startIndex=0):
+        # data is a memoryview over the bytes of a typed list
         idx = startIndex
-        lObj = len(obj)
+        lObj = data.nbytes
 
-        isBaseList = type(obj) == list
-        if not isBaseList:
-            while idx < lObj and bytesWritten < chunkSize:
-                bytesWritten = bytesWritten + self.con.write(obj[idx].tobytes())
-                idx += 1
-        else:
-            bytesToWrite = chunkSize - currentWritten
+        bytesToWrite = chunkSize - self.getSize()
 
-            if self.numListType == 1:
-                typeString = "<i"
-                
-                nToWrite = math.ceil(bytesToWrite/4)
-            else:
-                typeString = "<d"
-                nToWrite = math.ceil(bytesToWrite/8)
-
-            # if self.mode == "old":
-            #     while idx < lObj and bytesWritten < chunkSize:
-            #         sp = struct.pack(typeString, obj[idx])
-            #         bytesWritten = bytesWritten + self.con.write(sp)
-            #         idx += 1
-                    
-            # else:
-            if (idx+nToWrite) >= lObj:
-                nToWrite = lObj-idx
-            idx0 = idx
-            idxf = idx + nToWrite
-
-            packedBytes = array.array(typeString[1], obj[idx0:idxf]).tobytes()
-            self.con.write(packedBytes)
+        if bytesToWrite > 0:
+            nToWrite = min(bytesToWrite, lObj - idx)
+            self.buffer += data[idx:idx + nToWrite]
             idx += nToWrite
 
-
-            
-        if idx >= len(obj):
+        if idx >= lObj:
             idx = -1
-        return [self.con.tell(), idx]
+        return [self.getSize(), idx]
 
 
-    def addChunkedStringArray(self, obj, chunkSize, currentWritten=0, startIndex=0):
-        bytesWritten = currentWritten
+    def addChunkedStringArray(self, obj, chunkSize, startIndex=0):
         idx = startIndex
-
-        nB1 = self.getSize()
         lObj = len(obj)
 
-        bytesToWrite = chunkSize - currentWritten
+        bytesToWrite = chunkSize - self.getSize()
 
         if bytesToWrite > 0:
-            i1 = idx
-            
-            while idx < lObj and bytesWritten < chunkSize:
-                i2 = idx
-                nB2 = len(obj[idx]) + 1 # +1: null termination character for string in a list
-                bytesWritten += (nB2-nB1)
+            # Strings are encoded and added one by one until the budget is
+            # used, the last one may overshoot it
+            while idx < lObj and bytesToWrite > 0:
+                b = obj[idx].encode("utf-8")
+                self.buffer += b
+                self.buffer += NULL_BYTES
+                bytesToWrite -= len(b) + 1
                 idx += 1
-                nB1 = nB2
-                
-
-            i2 = i2 +1
-            self.addCString(obj[i1:i2])
-
 
-        if idx >= len(obj):
+        if idx >= lObj:
             idx = -1
 
-        return [self.con.tell(), idx]
+        return [self.getSize(), idx]
 
 
 
     def addStringListHead(self, obj):
-        count_bytes = 0
-        for my_str in obj:
-            count_bytes = count_bytes + len(my_str.encode("utf-8"))
-        self.addType(spec.LIST_STRING_TYPE)
-        self.addLength(count_bytes + len(obj))
+        if all(map(str.isascii, obj)):
+            count_bytes = sum(map(len, obj))
+        else:
+            count_bytes = sum(len(my_str.encode("utf-8")) for my_str in obj)
+        self.buffer += head_struct.pack(spec.LIST_STRING_TYPE, count_bytes + len(obj))
 
 
-    def getBytes(self):
-        return self.con.getvalue()
+    def getBytes(self, n=None):
+        # The first n bytes of the buffer (all by default)
+        if n is None:
+            return bytes(self.buffer)
+        return bytes(memoryview(self.buffer)[:n])
 
-    def clear(self):
-        self.con.truncate(0)
-        self.con.seek(0)
+    def clear(self, n=None):
+        # Removes the first n bytes of the buffer (all by default)
+        if n is None:
+            self.buffer.clear()
+        else:
+            del self.buffer[:n]
 
     def getSize(self):
-        return self.con.tell()
+        return len(self.buffer)
 
 class SerializerJsonIterator:
-    def __init__(self, jsonData, chunkSize=8*1024):
-        self.isMainDict = True
-        self.jsonData = list([list(jsonData.values())])
-
-        self.keys = list([list(jsonData.keys())])
-        self.numObjs = {}
-
-        self.buffer = io.BytesIO
-        self.currentKey = 0
+    # Yields the encoded document in chunks of about chunkSize bytes, each a
+    # bytes object owning its data. With exact=True every chunk is exactly
+    # chunkSize bytes, except the last.
+    # stats is an optional pytson.stats.TsonStats recording the encoding.
+    #
+    # With compression ("zlib", "bz2" or "lzma", see pytson.compression),
+    # iterating yields the compressed envelope instead, each chunk being
+    # compressed as it is produced; level is the codec's compression level.
+    def __init__(self, jsonData, chunkSize=8*1024, exact=False, stats=None, compression=None, level=None):
+        # Explicit stack of (isMap, iterator) frames, one per open map or
+        # list. Map iterators yield (key, value) pairs, list iterators values.
+        self.stack = [(True, iter(jsonData.items()))]
 
-        self.longArray = False
-        self.level = 0
-        self.arrayIdx = [0] # Has to be array so that we handle lists within generic lists
         self.addingIntegerArray = False
         self.addingStringArray = False
 
@@ -279,482 +339,568 @@ class SerializerJsonIterator:
         self.array = None
         
         self.serializer = SerializerIt()
+        if stats is not None:
+            stats.instrumentIterator(self)
+
         self.serializer.addTsonSpec()
         self.serializer.addMapHead(jsonData)
 
         self.maxChunk = chunkSize
-        self.bytesWritten = 0
+        self.exact = exact
+
+        self.compression = compression
+        self.level = level
 
 
-    #@profile
     def __listtype(self, obj):
-        currType = None
-        prevType = None
-
-        if len(obj) == 0:
-            return MIXED_LIST        
-        elif isinstance(obj[0], str):
-            listType = STRING_LIST
-        elif isinstance(obj[0], (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64, float,  np.float32, np.float64)):
-            if np.isnan(np.sum(obj)):
-                listType = MIXED_LIST
-            else:
-                listType = NUMERIC_LIST
-        else:
+        listType = getListType(obj)
+
+        # NaN values are not written as typed lists
+        if listType == NUMERIC_LIST and np.isnan(np.sum(obj)):
             return MIXED_LIST
-        #NOTE numeric lists are being turned into float arrays
-        # if self.mode == "old":
-            
-        #     for o in obj:
-        #         if prevType is None:
-        #             prevType =o.__class__
-        #         currType = o.__class__
-
-        #         if prevType != currType:
-        #             if listType == NUMERIC_LIST and isinstance(o, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64, float,  np.float32, np.float64)):
-        #                 return MIXED_NUMERIC_LIST
-        #             else:
-        #                 return MIXED_LIST
-        
-        return listType
-            
 
+        return listType
 
 
     def isAddingArray(self):
         return self.addingIntegerArray or self.addingStringArray
 
     def __iter__(self):
+        if self.compression is not None:
+            return compressChunks(self, self.compression, self.level)
         return self
 
-    #@profile
     def __next__(self):
-         
         while True:
-            notAddingArray = self.addingIntegerArray == False and self.addingStringArray == False
-            if notAddingArray:
-
-                if not self.level in self.numObjs:
-                    self.numObjs[self.level] = len(self.keys[self.level][:])
-                
-                n = self.numObjs[self.level]
-                idx = self.arrayIdx[self.level]
-
-                while idx >= n:
-                    self.level= self.level -1
-                    if self.level <= -1:
-                        break
-
-                    if not self.level in self.numObjs:
-                        self.numObjs[self.level] = len(self.keys[self.level][:])
-                    
-                    n = self.numObjs[self.level]
-                    
-                    
-                    idx = self.arrayIdx[self.level]
-
-                if self.level <= -1: 
+            if self.serializer.getSize() >= self.maxChunk:
+                return self.getChunk()
+
+            if self.addingStringArray:
+                self.addStringArray(self.array)
+            elif self.addingIntegerArray:
+                data = self.array
+                idx = self.chunkedIndex
+                if self.serializer.getSize() == 0 and data.nbytes - idx >= self.maxChunk:
+                    # Whole chunks of a typed list are copied once from the
+                    # array, without going through the buffer
+                    end = idx + self.maxChunk
+                    self.setChunkedArray(data, end if end < data.nbytes else -1)
+                    self.addingIntegerArray = self.array is not None
+                    return bytes(data[idx:end])
+
+                self.addNumericArray(data)
+            else:
+                if len(self.stack) == 0:
                     if self.serializer.getSize() > 0:
-                        bts = self.serializer.getBytes()
-                        self.serializer.clear()
-                        return bts
+                        return self.getChunk()
                     else:
                         raise StopIteration
-                
-                self.arrayIdx[self.level] = self.arrayIdx[self.level] + 1
 
-                key = self.keys[self.level][idx]
+                isMap, it = self.stack[-1]
 
+                try:
+                    item = next(it)
+                except StopIteration:
+                    # Map or list is complete
+                    self.stack.pop()
+                    continue
 
-                if key != "@@NOKEY@@":
+                if isMap:
+                    key, obj = item
                     self.serializer.addString(key)
-
-                obj = self.jsonData[self.level][idx]
-
-
-            else:
-                obj = self.array
-             
-            if obj is None and notAddingArray:
-                self.bytesWritten = self.bytesWritten + self.serializer.addNull()
-            elif isinstance(obj, bool ) and notAddingArray:
-                self.bytesWritten = self.bytesWritten + self.serializer.addBool(obj)
-            elif isinstance(obj, str) and notAddingArray:
-                self.bytesWritten = self.bytesWritten + self.serializer.addString(obj)
-
-            elif isinstance(obj, (float,  np.float32, np.float64)) and notAddingArray:
-                self.bytesWritten = self.bytesWritten + self.serializer.addDouble(obj)
-            elif isinstance(obj, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64)) and notAddingArray:
-                self.bytesWritten = self.bytesWritten + self.serializer.addInteger(obj)
-
-            # # # String, Int/float and other lists
-            elif isinstance(obj, np.ndarray) or isinstance(obj, list):
-
-                if notAddingArray:
-                    listType = self.__listtype(obj)
-                else:
-                    listType = None
-                
-                if self.addingStringArray or listType == STRING_LIST:
-                    if not self.addingStringArray:
-                        self.serializer.addStringListHead(obj)
-
-                    
-                    res = self.serializer.addChunkedStringArray(obj,  self.maxChunk, self.bytesWritten, self.chunkedIndex)
-                    self.bytesWritten = self.bytesWritten + res[0]
-                    # obj = res[1]
-                    
-                    
-
-                    if res[1] >= 0:
-                        # There is still more to add
-                        self.addingStringArray = True
-                        self.array = obj
-                        self.chunkedIndex = res[1]
-                    else:
-                        self.addingStringArray = False
-                        self.array = None
-                        self.chunkedIndex = 0
-
-                elif self.addingIntegerArray or listType == NUMERIC_LIST or listType == MIXED_NUMERIC_LIST:
-                    if not self.addingIntegerArray:
-                        if not isinstance(obj, list):
-                            # Packing base lists into bytes is currently faster by about 50%
-                            obj = obj.tolist()
-                        # if self.mode == "old":
-                        #     if listType == MIXED_NUMERIC_LIST:
-                        #         # Upcasts the list to float
-                        #         obj = [float(i) for i in obj]
-                        # else:
-                        if listType == NUMERIC_LIST:
-                            map(float, obj)
-
-                        self.serializer.addIntegerListHead(obj)
-
-                    
-
-                    res = self.serializer.addChunkedNumericArray(obj,  self.maxChunk, self.bytesWritten, self.chunkedIndex)
-                    self.bytesWritten = self.bytesWritten + res[0]
-
-                    if res[1] >= 0:
-                        # There is still more to add
-                        self.addingIntegerArray = True
-                        self.array = obj
-                        self.chunkedIndex = res[1]
-                    else:
-                        self.addingIntegerArray = False
-                        self.array = None
-                        self.chunkedIndex = 0
-
-
                 else:
-                    self.serializer.addListHead(obj)
+                    obj = item
 
-                    
-                    if not self.level in self.numObjs:
-                        self.numObjs[self.level] = 0
+                self.addObject(obj)
 
-                    for k in np.arange(len(obj)-1, -1, -1):
-                        o = obj[k]
-                        self.jsonData[self.level].insert(self.arrayIdx[self.level], o)
-                        self.keys[self.level].insert(self.arrayIdx[self.level],"@@NOKEY@@")
-                        self.numObjs[self.level] = self.numObjs[self.level]+1
+    def getChunk(self):
+        if self.exact:
+            # At most maxChunk bytes, the remainder stays at the start of the
+            # buffer for the next chunk
+            n = min(self.maxChunk, self.serializer.getSize())
+            bts = self.serializer.getBytes(n)
+            self.serializer.clear(n)
+        else:
+            bts = self.serializer.getBytes()
+            self.serializer.clear()
+        return bts
 
-                    # self.numObjs[self.level] = len(self.keys[self.level][:])
+    def addObject(self, obj):
+        if obj is None:
+            self.serializer.addNull()
+        elif isinstance(obj, bool ):
+            self.serializer.addBool(obj)
+        elif isinstance(obj, str):
+            self.serializer.addString(obj)
+        elif isinstance(obj, (float,  np.float32, np.float64)):
+            self.serializer.addDouble(obj)
+        elif isinstance(obj, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64)):
+            self.serializer.addInteger(obj)
+
+        # String, Int/float and other lists
+        elif isinstance(obj, np.ndarray) or isinstance(obj, list):
+            listType = self.__listtype(obj)
 
-            # # Maps
-            elif isinstance(obj, dict):
-                self.level = self.level + 1
+            if listType == STRING_LIST:
+                self.serializer.addStringListHead(obj)
+                self.addStringArray(obj)
+            elif listType == NUMERIC_LIST or listType == MIXED_NUMERIC_LIST:
+                if listType == MIXED_NUMERIC_LIST:
+                    # Upcasts the list to float
+                    obj = np.asarray(obj, dtype=np.float64)
 
-                if self.level >= len(self.arrayIdx):
-                    self.arrayIdx.append(0)
-                else:
-                    # Level was previously reached, so we overwrite the data
-                    self.arrayIdx[self.level] = 0
+                arr = self.serializer.addIntegerListHead(obj)
+                if len(arr) > 0:
+                    self.addNumericArray(memoryview(arr).cast("B"))
+            else:
+                # Elements are visited through a new frame
+                self.serializer.addListHead(obj)
+                self.stack.append((False, iter(obj)))
 
-                self.serializer.addMapHead(obj)
-                keys = list(obj.keys())
+        # Maps
+        elif isinstance(obj, dict):
+            self.serializer.addMapHead(obj)
+            self.stack.append((True, iter(obj.items())))
 
-                if self.level >= len(self.keys):
-                    self.keys.append(keys)
-                    self.jsonData.append(list(obj.values()))
-                else:
-                    self.keys[self.level] = keys
-                    self.numObjs[self.level] = len(keys)
-                    self.jsonData[self.level] = list(obj.values())
+        else:
+            raise TsonError("Unknown object type.")
 
-                continue
+    # Typed and string lists are written in chunks, the array is kept until
+    # it has been completely added
+    def addStringArray(self, obj):
+        res = self.serializer.addChunkedStringArray(obj,  self.maxChunk, self.chunkedIndex)
+        self.setChunkedArray(obj, res[1])
+        self.addingStringArray = self.array is not None
+
+    def addNumericArray(self, obj):
+        res = self.serializer.addChunkedBytes(obj,  self.maxChunk, self.chunkedIndex)
+        self.setChunkedArray(obj, res[1])
+        self.addingIntegerArray = self.array is not None
+
+    def setChunkedArray(self, obj, idx):
+        if idx >= 0:
+            # There is still more to add
+            self.array = obj
+            self.chunkedIndex = idx
+        else:
+            self.array = None
+            self.chunkedIndex = 0
 
-            else:
-                raise TsonError("Unknown object type.")
+class Serializer:
+    # Handler method of each exact type. Subclasses of these types are
+    # resolved by resolveHandler and cached on the instance only.
+    handlerNames = {
+        type(None): "addNull",
+        bool: "addBool",
+        str: "addString",
+        float: "addDouble",
+        np.float32: "addDouble",
+        np.float64: "addDouble",
+        int: "addInteger",
+        np.int8: "addInteger",
+        np.int16: "addInteger",
+        np.int32: "addInteger",
+        np.int64: "addInteger",
+        np.uint8: "addInteger",
+        np.uint16: "addInteger",
+        np.uint32: "addInteger",
+        np.uint64: "addInteger",
+        list: "addAnyList",
+        np.ndarray: "addAnyList",
+        dict: "addMap",
+        EncodedStringList: "addEncodedStringList",
+    }
+
+    # header=False leaves out the version, giving the encoding of obj alone.
+    # With factors=True, string lists with few distinct values are written
+    # as factors (see addStringList). stats is an optional
+    # pytson.stats.TsonStats recording the encoding.
+    def __init__(self, obj, con=None, header=True, factors=False, stats=None):
+        self.con = con or StringIO()
+        self.factors = factors
 
+        # Shared table of the class, copied before a resolved type is added
+        self.handlers = self.getHandlerTable()
 
+        if stats is not None:
+            stats.instrumentSerializer(self)
 
-            if self.bytesWritten   > self.maxChunk:
-                bts = self.serializer.getBytes()
-                self.serializer.clear()
-                self.bytesWritten = 0
-                return bts
-            else:
-                continue
+        # Output is appended to a buffer which is written to con once it
+        # holds DIRECT_WRITE_SIZE bytes, and at the end
+        self.buffer = self.newBuffer()
 
-class Serializer:
-    def __init__(self, obj, con=None):
-        self.con = con or StringIO()
+        if header:
+            self.addString(spec.TSON_SPEC_VERSION)
 
-        self.addString(spec.TSON_SPEC_VERSION)
         self.addObject(obj)
-
+        self.flush()
+
+    # type -> handler function of the class, called as handler(self, obj).
+    # Built once per class, so that overrides in subclasses are used.
+    @classmethod
+    def getHandlerTable(cls):
+        table = cls.__dict__.get("handlerTable")
+        if table is None:
+            table = {t: getattr(cls, name) for t, name in Serializer.handlerNames.items()}
+            cls.handlerTable = table
+        return table
+
+    # Handler function of a method, called as handler(self, obj). A method
+    # replaced on the instance (see pytson.stats) is called through it.
+    def getHandler(self, name):
+        method = self.__dict__.get(name)
+        if method is None:
+            return getattr(type(self), name)
+        return lambda _, obj: method(obj)
+
+    def newBuffer(self):
+        return bytearray()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.con.write(self.buffer)
+            self.buffer = self.newBuffer()
 
     def addType(self, spec_type):
-        self.con.write(struct.pack("<B", spec_type))
+        self.buffer += type_struct.pack(spec_type)
 
     def addLength(self, length):
         # to:do - check list length
-        self.con.write(struct.pack("<I", length))
-
-
-    # Add object
-    def __istype(self, obj, typeList):
-        return np.any(  [isinstance(obj, t) for t in typeList ] )
-
-    def __islisttype(self, obj, typeList):
-        res = True
-
-        if len(obj) == 0:
-            res = False
-        else:
-            res = all([isinstance(o,tuple(typeList)) for o in obj])
-
-        return res
+        self.buffer += length_struct.pack(length)
 
+    def addHead(self, spec_type, length):
+        self.buffer += head_struct.pack(spec_type, length)
 
-    def __listdtype(self, obj, typeList):
-        # Assumptions
-        #  1. List has been checked to ensure all ae of the same type
-        #  2. Values will only match one type within typeList
-        o = obj[0]
 
-        typeCheck = [isinstance(o, t) for t in typeList ]
-
-        res = [i for i, val in enumerate(typeCheck) if val]
-        return typeList[res[0]]
-    
-    def __listtype(self, obj):
-        currType = None
-        prevType = None
-
-        if len(obj) == 0:
-            return MIXED_LIST        
-        elif isinstance(obj[0], str):
-            listType = STRING_LIST
-        elif isinstance(obj[0], (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64, float,  np.float32, np.float64)):
-            listType = NUMERIC_LIST
-        else:
-            return MIXED_LIST
+    # Add object
+    def addObject(self, obj):
+        # Dispatch on the exact type. Other types (subclasses) are resolved
+        # once by the slow path and cached
+        try:
+            handler = self.handlers[type(obj)]
+        except KeyError:
+            handler = self.resolveHandler(type(obj))
 
-            
-        for o in obj:
-            if prevType is None:
-                prevType = o.__class__
-                continue
-            
-            currType = o.__class__
-
-            if prevType != currType:
-                if listType == NUMERIC_LIST and isinstance(o, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64, float,  np.float32, np.float64)):
-                    return MIXED_NUMERIC_LIST
-                else:
-                    return MIXED_LIST
-        
-        return listType
+        handler(self, obj)
 
-            
-        #'test', False, '2035'
-    def addObject(self, obj):
-        # Basic types
+    def resolveHandler(self, t):
         # bool must come before int
+        if issubclass(t, type(None)):
+            name = "addNull"
+        elif issubclass(t, bool):
+            name = "addBool"
+        elif issubclass(t, str):
+            name = "addString"
+        elif issubclass(t, (float,  np.float32, np.float64)):
+            name = "addDouble"
+        elif issubclass(t, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64)):
+            name = "addInteger"
+        # String, Int/float and other lists
+        elif issubclass(t, (np.ndarray, list)):
+            name = "addAnyList"
+        # Maps
+        elif issubclass(t, dict):
+            name = "addMap"
+        else:
+            raise TsonError("Unknown object type.")
 
-        # If not yet instantiated, do so
-        # if isinstance(obj, types.GeneratorType):
-            # obj = next(obj)
+        if self.handlers is self.getHandlerTable():
+            self.handlers = dict(self.handlers)
 
+        handler = self.getHandler(name)
+        self.handlers[t] = handler
+        return handler
 
-        if obj is None:
-            self.addNull()
-        elif isinstance(obj, bool):
-            self.addBool(obj)
-        elif self.__istype(obj, typeList=[str]):
-            self.addString(obj)
-
-        elif self.__istype(obj, typeList=[float,  np.float32, np.float64]):
-            self.addDouble(obj)
-        elif self.__istype(obj, typeList=[int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64]):
-            self.addInteger(obj)
-
-        # # String, Int/float and other lists
-        elif isinstance(obj, np.ndarray) or isinstance(obj, list):
-            listType = self.__listtype(obj)
-
-            if listType == STRING_LIST:#self.__islisttype(obj, typeList=[str]):
-                self.addStringList(obj)
-            elif listType == NUMERIC_LIST or listType == MIXED_NUMERIC_LIST:#self.__islisttype(obj, typeList=[float, np.float32, np.float64, int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64]):
-                # if isinstance(obj, list):
-                if listType == MIXED_NUMERIC_LIST:
-                    # Upcasts the list to float
-                    obj = [float(i) for i in obj]
-                    # raise TsonError("Base Python lists are not supported for numeric arrays. Please convert to numpy array with numpy.array(list).")
-                self.addIntegerList(obj)
-            else:
-                self.addList(obj)
-
-        
-        # Maps
-        elif isinstance(obj, dict):
-            self.addMap(obj)
+    def addAnyList(self, obj):
+        listType = getListType(obj)
 
+        if listType == STRING_LIST:
+            self.addStringList(obj)
+        elif listType == NUMERIC_LIST or listType == MIXED_NUMERIC_LIST:
+            if listType == MIXED_NUMERIC_LIST:
+                # Upcasts the list to float
+                obj = np.asarray(obj, dtype=np.float64)
+            self.addIntegerList(obj)
         else:
-            raise TsonError("Unknown object type.")
+            self.addList(obj)
 
     # Basic types (null, string, integer, double, bool)
-    def addNull(self):
-        self.addType(spec.NULL_TYPE)
+    def addNull(self, obj=None):
+        self.buffer += NULL_BYTES
 
     def addString(self, obj):
-        self.addType(spec.STRING_TYPE)
-        
-        self.con.write(struct.pack("{0}s".format(len(obj)), obj.encode("utf-8")))
-        self.addNull()
+        self.buffer += STRING_TYPE_BYTES
+        self.buffer += obj.encode("utf-8")
+        self.buffer += NULL_BYTES
 
     def addCString(self, obj):
-        self.con.write(struct.pack("{0}s".format(len(obj)), obj.encode("utf-8")))
-        self.addNull()
+        self.buffer += obj.encode("utf-8")
+        self.buffer += NULL_BYTES
 
     def addInteger(self, obj):
-        self.addType(spec.INTEGER_TYPE)
-        self.con.write(struct.pack("<i", obj))
+        self.buffer += packInteger(obj)
 
     def addDouble(self, obj):
-        self.addType(spec.DOUBLE_TYPE)
-        self.con.write(struct.pack("<d", obj))
+        self.buffer += double_struct.pack(spec.DOUBLE_TYPE, obj)
 
     def addBool(self, obj):
-        self.addType(spec.BOOL_TYPE)
-        self.con.write(struct.pack("<B", obj))
+        self.buffer += bool_struct.pack(spec.BOOL_TYPE, obj)
 
     # Basic list
     def addList(self, l):
-        self.addType(spec.LIST_TYPE)
-        self.addLength(len(l))
+        self.addHead(spec.LIST_TYPE, len(l))
 
         for o in l:  # loop through objects
             self.addObject(o)
+            if len(self.buffer) >= DIRECT_WRITE_SIZE:
+                self.flush()
 
     # Basic map
     def addMap(self, m):
-        self.addType(spec.MAP_TYPE)
-        self.addLength(len(m))
+        self.addHead(spec.MAP_TYPE, len(m))
 
-        
         for k, v in m.items():
             if  not k is None and not (isinstance(k, str)) and len(k) != 0:
                 raise TsonError("Map key must be a String.")
 
             self.addString(k)
             self.addObject(v)
+            if len(self.buffer) >= DIRECT_WRITE_SIZE:
+                self.flush()
 
-    def addMapThreaded(self, m):
-        self.addType(spec.MAP_TYPE)
-        self.addLength(len(m))
-
-        for k, v in m.items():
-            if  not k is None and not (isinstance(k, str)) and len(k) != 0:
-                raise TsonError("Map key must be a String.")
-
-            self.addString(k)
-            self.addObjectThreaded(v)
-    
-    
     # Integer lists
     def addIntegerList(self, obj):
-        # __istype(self, obj, typeList):
-        dtype = self.__listdtype(obj,[float, np.float32, np.float64, int, np.int8, np.int16, 
-                    np.int32, np.int64, np.uint, np.uint8, 
-                    np.uint16, np.uint32, np.uint64] )
-
-
-
-        if dtype == np.dtype("int8"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT8_TYPE)
-            
-        elif dtype == np.dtype("uint8"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT8_TYPE)
-            
-        elif dtype == np.dtype("int16"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT16_TYPE)
-            
-        elif dtype == np.dtype("uint16"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT16_TYPE)
-            
-        elif dtype == np.dtype("int32")  or dtype == int:
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT32_TYPE)
-            
-        elif dtype == np.dtype("uint32"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT32_TYPE)
-            
-        elif dtype == np.dtype("int64"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_INT64_TYPE)
-            
-        elif dtype == np.dtype("uint64"):
-            self.numListType = 1
-            self.addTypedNumList(obj, type=spec.LIST_UINT64_TYPE)
-        elif dtype == np.dtype("float32"):
-            self.numListType = 2
-            self.addTypedNumList(obj, type=spec.LIST_FLOAT32_TYPE)
-        elif dtype == np.dtype("float64") or dtype == float:
-            self.numListType = 2
-            self.addTypedNumList(obj, type=spec.LIST_FLOAT64_TYPE)
-        else:
-            raise ValueError("List type " + str(dtype) + " not found.")
+        type, arr = toTypedList(obj)
+        self.addTypedNumList(arr, type=type)
 
     def addTypedNumList(self, obj, type):
-        _l = len(obj)
-        self.addType(type)
-        self.addLength(_l)
+        # Python lists are converted in one pass, numpy arrays already in the
+        # little-endian dtype of the list type are used as they are
+        arr = np.ascontiguousarray(obj, dtype=typed_list_dtypes[type])
 
+        self.addHead(type, len(arr))
+
+        # Written through the buffer protocol, without a tobytes() copy
+        self.addBytes(memoryview(arr).cast("B"))
+
+    def addStringList(self, obj):
+        if self.factors and len(obj) >= FACTOR_MIN_LENGTH:
+            levels = {}
+            codes = [levels.setdefault(x, len(levels)) for x in obj]
+
+            if len(levels) <= FACTOR_MAX_LEVEL_RATIO * len(obj):
+                self.addFactor(codes, list(levels))
+                return
+
+        batches = range(0, len(obj), STRING_BATCH_SIZE)
+        if all(map(str.isascii, obj)):
+            # The length is known without encoding, batches are encoded as
+            # they are written
+            self.addHead(spec.LIST_STRING_TYPE, sum(map(len, obj)) + len(obj))
+            for i in batches:
+                self.addBytes(joinStrings(obj[i:i + STRING_BATCH_SIZE]))
+        else:
+            blocks = [joinStrings(obj[i:i + STRING_BATCH_SIZE]) for i in batches]
+            self.addHead(spec.LIST_STRING_TYPE, sum(map(len, blocks)))
+            for block in blocks:
+                self.addBytes(block)
+
+    # A factor is a standard map, so readers without factor support still
+    # decode it (as that map)
+    def addFactor(self, codes, levels):
+        self.addHead(spec.MAP_TYPE, 2)
+        self.addString(FACTOR_LEVELS_KEY)
+        self.addEncodedStringList(joinStrings(levels))
+        self.addString(FACTOR_CODES_KEY)
+        self.addIntegerList(codes)
+
+    def addEncodedStringList(self, obj):
+        self.addHead(spec.LIST_STRING_TYPE, len(obj))
+        self.addBytes(obj)
+
+    # Large data goes straight to con rather than through the buffer, which
+    # is written out once it is full
+    def addBytes(self, data):
+        if len(data) >= DIRECT_WRITE_SIZE:
+            self.flush()
+            self.con.write(data)
+        else:
+            self.buffer += data
+            if len(self.buffer) >= DIRECT_WRITE_SIZE:
+                self.flush()
+
+    def getBytes(self):
+        return self.con
 
-        try:
-            # bytesWritten = bytesWritten + self.con.write(obj[idx].tobytes())
-            self.con.write(obj.tobytes())
-        except:
-            # Base python list
-            if self.numListType == 1:
-                for o in obj:
-                    self.con.write(struct.pack("<i", o))
-                # bytesWritten = bytesWritten + self.con.tell()
-            else:
-                for o in obj:
-                    self.con.write(struct.pack("<d", o))
-        # self.con.write(obj.tobytes())
 
+class BufferWriter:
+    # Output of BufferSerializer: bytes appended with += or written with
+    # write() are copied into target at offset, which then moves past them.
+    def __init__(self, target, offset=0):
+        self.target = target
+        self.offset = offset
+
+    def __iadd__(self, data):
+        self.write(data)
+        return self
+
+    # Nothing is ever pending, see Serializer.flush
+    def __len__(self):
+        return 0
+
+    def __bool__(self):
+        return True
+
+    def write(self, data):
+        n = memoryview(data).nbytes
+        self.target[self.offset:self.offset + n] = data
+        self.offset += n
+        return n
 
 
+class BufferSerializer(Serializer):
+    # Serializer writing in place into target (a writable bytes-like object
+    # such as a bytearray, mmap or shared memory buffer) from offset. The
+    # fixed size parts are packed straight into target, which must be large
+    # enough for the whole encoding (see encodedSize). encoded is the cache
+    # filled by encodedSize, whose strings and lists are written as they are
+    # rather than encoded again.
+    def __init__(self, obj, target, offset=0, header=True, encoded=None):
+        self.writer = BufferWriter(memoryview(target).cast("B"), offset)
+        self.encoded = {} if encoded is None else encoded
+        Serializer.__init__(self, obj, self.writer, header=header)
+
+    def newBuffer(self):
+        return self.writer
+
+    # Nothing is pending, the buffer and con are both the writer
+    def flush(self):
+        pass
+
+    def getOffset(self):
+        return self.writer.offset
+
+    # Releases the view on target, which can then be resized or closed
+    def release(self):
+        self.writer.target.release()
+
+    def addType(self, spec_type):
+        w = self.writer
+        type_struct.pack_into(w.target, w.offset, spec_type)
+        w.offset += 1
+
+    def addLength(self, length):
+        w = self.writer
+        length_struct.pack_into(w.target, w.offset, length)
+        w.offset += 4
+
+    def addHead(self, spec_type, length):
+        w = self.writer
+        head_struct.pack_into(w.target, w.offset, spec_type, length)
+        w.offset += 5
+
+    def addNull(self, obj=None):
+        w = self.writer
+        w.target[w.offset] = spec.NULL_TYPE
+        w.offset += 1
+
+    def addString(self, obj):
+        w = self.writer
+        b = self.encoded.get(id(obj))
+        if b is None:
+            b = obj.encode("utf-8")
+        i = w.offset
+        w.target[i] = spec.STRING_TYPE
+        w.target[i + 1:i + 1 + len(b)] = b
+        w.target[i + 1 + len(b)] = 0
+        w.offset = i + 2 + len(b)
+
+    def addDouble(self, obj):
+        w = self.writer
+        double_struct.pack_into(w.target, w.offset, spec.DOUBLE_TYPE, obj)
+        w.offset += 9
+
+    def addBool(self, obj):
+        w = self.writer
+        bool_struct.pack_into(w.target, w.offset, spec.BOOL_TYPE, obj)
+        w.offset += 2
+
+    def addIntegerList(self, obj):
+        cached = self.encoded.get(id(obj))
+        if cached is None:
+            Serializer.addIntegerList(self, obj)
+        else:
+            self.addTypedNumList(cached[1], type=cached[0])
 
     def addStringList(self, obj):
-        count_bytes = 0
-        for my_str in obj:
-            count_bytes = count_bytes + len(my_str.encode("utf-8"))
-        self.addType(spec.LIST_STRING_TYPE)
-        self.addLength(count_bytes + len(obj))
-        for x in obj:
-            self.addCString(x)
+        block = self.encoded.get(id(obj))
+        if block is None:
+            Serializer.addStringList(self, obj)
+        else:
+            self.addEncodedStringList(block)
+
+
+# Size in bytes of a string once encoded and null terminated. A string which
+# is not ASCII is UTF-8 encoded, and kept in cache under its id when given.
+def cStringSize(obj, cache=None):
+    if obj.isascii():
+        return len(obj) + 1
+
+    b = obj.encode("utf-8")
+    if cache is not None:
+        cache[id(obj)] = b
+    return len(b) + 1
+
+
+# Exact size in bytes of the encoding of obj by Serializer (without the
+# version), computed without encoding it. Strings are only UTF-8 encoded
+# when they are not ASCII. With cache (a dict), what had to be encoded or
+# converted to find the size (non-ASCII strings and string lists, typed
+# arrays of numeric lists) is kept there under the id of its object, for
+# BufferSerializer to write without doing it again.
+def encodedSize(obj, cache=None):
+    t = type(obj)
+
+    if obj is None:
+        return 1
+    elif issubclass(t, bool):
+        return 2
+    elif issubclass(t, str):
+        return 1 + cStringSize(obj, cache)
+    elif issubclass(t, (float, np.float32, np.float64)):
+        return 9
+    elif issubclass(t, (int, np.int8, np.int16, np.int32, np.int64, np.uint, np.uint8, np.uint16, np.uint32, np.uint64)):
+        # The same fallback as packInteger
+        return len(packInteger(obj))
+    elif issubclass(t, EncodedStringList):
+        return 5 + len(obj)
+    elif issubclass(t, (np.ndarray, list)):
+        listType = getListType(obj)
+
+        if listType == STRING_LIST:
+            if all(map(str.isascii, obj)):
+                return 5 + sum(map(len, obj)) + len(obj)
+
+            block = joinStrings(obj)
+            if cache is not None:
+                cache[id(obj)] = block
+            return 5 + len(block)
+        elif listType == MIXED_NUMERIC_LIST:
+            # Upcast to float64
+            return 5 + 8 * len(obj)
+        elif listType == NUMERIC_LIST:
+            typedList = toTypedList(obj)
+            if cache is not None:
+                cache[id(obj)] = typedList
+            return 5 + typedList[1].nbytes
+        else:
+            return 5 + sum(encodedSize(o, cache) for o in obj)
+    elif issubclass(t, dict):
+        return 5 + sum(1 + cStringSize(k, cache) + encodedSize(v, cache) for k, v in obj.items())
+    else:
+        raise TsonError("Unknown object type.")
 
-    def getBytes(self):
-        return self.con
+
+def encodeObject(obj, factors=False):
+    # Encoding of obj without the version, used by record streams
+    return Serializer(obj, header=False, factors=factors).getBytes().getvalue()
@@ -0,0 +1,289 @@
+import time
+from collections import defaultdict
+
+import pytson.spec as spec
+from pytson.serializer import SerializerJsonIterator, typed_list_types
+
+# Name of each type code, used by TsonStats.summary
+type_names = {
+    spec.NULL_TYPE: "null",
+    spec.STRING_TYPE: "string",
+    spec.INTEGER_TYPE: "integer",
+    spec.DOUBLE_TYPE: "double",
+    spec.BOOL_TYPE: "bool",
+    spec.LIST_TYPE: "list",
+    spec.MAP_TYPE: "map",
+    spec.LIST_UINT8_TYPE: "list_uint8",
+    spec.LIST_UINT16_TYPE: "list_uint16",
+    spec.LIST_UINT32_TYPE: "list_uint32",
+    spec.LIST_INT8_TYPE: "list_int8",
+    spec.LIST_INT16_TYPE: "list_int16",
+    spec.LIST_INT32_TYPE: "list_int32",
+    spec.LIST_INT64_TYPE: "list_int64",
+    spec.LIST_UINT64_TYPE: "list_uint64",
+    spec.LIST_FLOAT32_TYPE: "list_float32",
+    spec.LIST_FLOAT64_TYPE: "list_float64",
+    spec.LIST_STRING_TYPE: "list_string",
+}
+
+# Methods of Serializer and SerializerIt recorded under a fixed type code
+serializer_methods = {
+    "addNull": spec.NULL_TYPE,
+    "addString": spec.STRING_TYPE,
+    "addInteger": spec.INTEGER_TYPE,
+    "addDouble": spec.DOUBLE_TYPE,
+    "addBool": spec.BOOL_TYPE,
+    "addList": spec.LIST_TYPE,
+    "addMap": spec.MAP_TYPE,
+    "addStringList": spec.LIST_STRING_TYPE,
+    "addEncodedStringList": spec.LIST_STRING_TYPE,
+}
+
+iterator_methods = {
+    "addNull": spec.NULL_TYPE,
+    "addString": spec.STRING_TYPE,
+    "addInteger": spec.INTEGER_TYPE,
+    "addDouble": spec.DOUBLE_TYPE,
+    "addBool": spec.BOOL_TYPE,
+    "addListHead": spec.LIST_TYPE,
+    "addMapHead": spec.MAP_TYPE,
+}
+
+
+class TsonStats:
+    # Opt-in instrumentation of Serializer, SerializerJsonIterator and
+    # DeSerializer, passed to them as stats=. Records, per type code, the
+    # number of values, their encoded size in bytes and the time spent on
+    # them, plus the read and write calls made on the stream.
+    #
+    # Sizes and times of lists and maps include their elements, and map keys
+    # are counted as strings. The methods of an instrumented object are
+    # replaced by recording wrappers on that instance only, so objects
+    # created without stats run the plain code.
+    #
+    # SerializerJsonIterator encodes lazily, as chunks are taken: the size of
+    # its lists and maps is that of their head, elements being recorded on
+    # their own, and the time of typed and string lists only covers the head.
+    # A stats object accumulates over every object it instruments until
+    # reset().
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.sizes = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+        self.reads = 0
+        self.bytesRead = 0
+        self.writes = 0
+        self.bytesWritten = 0
+
+    def record(self, code, size, seconds):
+        self.counts[code] += 1
+        self.sizes[code] += size
+        self.seconds[code] += seconds
+
+    # type name -> {"count", "bytes", "seconds"}, plus an "io" entry
+    def summary(self):
+        result = {
+            type_names.get(code, str(code)): {
+                "count": self.counts[code],
+                "bytes": self.sizes[code],
+                "seconds": self.seconds[code],
+            }
+            for code in sorted(self.counts)
+        }
+        result["io"] = {
+            "reads": self.reads,
+            "bytes_read": self.bytesRead,
+            "writes": self.writes,
+            "bytes_written": self.bytesWritten,
+        }
+        return result
+
+    def __repr__(self):
+        lines = ["{0:<14} {1:>10} {2:>14} {3:>10}".format("type", "count", "bytes", "seconds")]
+        for name, s in self.summary().items():
+            if name != "io":
+                lines.append("{0:<14} {1:>10} {2:>14} {3:>10.4f}".format(name, s["count"], s["bytes"], s["seconds"]))
+        lines.append(
+            "reads {0} ({1} bytes), writes {2} ({3} bytes)".format(
+                self.reads, self.bytesRead, self.writes, self.bytesWritten
+            )
+        )
+        return "\n".join(lines)
+
+    # Replaces obj.name by a wrapper recording each call under code, or
+    # under the code returned by getCode(args, kwargs, result). position()
+    # is the number of bytes written or read so far.
+    def wrap(self, obj, name, position, code=None, getCode=None):
+        method = getattr(obj, name)
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = position()
+            t = perf_counter()
+            result = method(*args, **kwargs)
+            self.record(
+                code if getCode is None else getCode(args, kwargs, result),
+                position() - start,
+                perf_counter() - t,
+            )
+            return result
+
+        setattr(obj, name, wrapper)
+
+    def instrumentSerializer(self, serializer):
+        con = serializer.con
+        writer = CountingWriter(con, self)
+        serializer.con = writer
+        serializer.getBytes = lambda: con
+
+        position = lambda: writer.position + len(serializer.buffer)
+
+        for name, code in serializer_methods.items():
+            self.wrap(serializer, name, position, code)
+
+        self.wrap(
+            serializer, "addTypedNumList", position,
+            getCode=lambda args, kwargs, result: kwargs["type"] if "type" in kwargs else args[1],
+        )
+
+        # Dispatch goes through the wrappers, in a table of this instance
+        serializer.handlers = {t: serializer.getHandler(name) for t, name in serializer.handlerNames.items()}
+
+    def instrumentIterator(self, iterator):
+        serializer = iterator.serializer
+        position = serializer.getSize
+
+        for name, code in iterator_methods.items():
+            self.wrap(serializer, name, position, code)
+
+        # List payloads are added later in chunks, their size is recorded
+        # with the head
+        addIntegerListHead = serializer.addIntegerListHead
+        addStringListHead = serializer.addStringListHead
+        perf_counter = time.perf_counter
+
+        def addIntegerListHeadStats(obj):
+            t = perf_counter()
+            arr = addIntegerListHead(obj)
+            code = typed_list_types[arr.dtype]
+            self.record(code, spec.TYPE_LENGTH_IN_BYTES + spec.ELEMENT_LENGTH_IN_BYTES + arr.nbytes, perf_counter() - t)
+            return arr
+
+        def addStringListHeadStats(obj):
+            t = perf_counter()
+            addStringListHead(obj)
+            l = int.from_bytes(serializer.buffer[-spec.ELEMENT_LENGTH_IN_BYTES:], "little")
+            self.record(spec.LIST_STRING_TYPE, spec.TYPE_LENGTH_IN_BYTES + spec.ELEMENT_LENGTH_IN_BYTES + l, perf_counter() - t)
+
+        serializer.addIntegerListHead = addIntegerListHeadStats
+        serializer.addStringListHead = addStringListHeadStats
+
+        # __next__ is looked up on the class, the emitted chunks are counted
+        # by a subclass
+        iterator.stats = self
+        iterator.__class__ = CountingJsonIterator
+
+    def instrumentDeserializer(self, ds):
+        if ds.mode == "buffer":
+            position = lambda: ds.offset
+        else:
+            reader = CountingReader(ds.con, self)
+            ds.con = reader
+
+            # Bytes already taken from the stream by readCompression
+            pending = len(ds.byteChunk) + len(ds.pushback)
+            if pending > 0:
+                reader.position = pending
+                self.reads += 1
+                self.bytesRead += pending
+            if ds.mode == "old":
+                position = lambda: reader.position
+            else:
+                # Bytes fetched minus those still pending in the chunk
+                position = lambda: reader.position - (len(ds.byteChunk) - ds.chunkPointer)
+
+        # The type code is only known once readObject has read it, so each
+        # call pushes a slot which the first readType of that call fills
+        types = []
+        readType = ds.readType
+        readObject = ds.readObject
+        perf_counter = time.perf_counter
+
+        def readTypeStats():
+            _type = readType()
+            if len(types) > 0 and types[-1] is None:
+                types[-1] = _type
+            return _type
+
+        def readObjectStats():
+            start = position()
+            t = perf_counter()
+            types.append(None)
+            try:
+                obj = readObject()
+            finally:
+                _type = types.pop()
+            self.record(_type, position() - start, perf_counter() - t)
+            return obj
+
+        ds.readType = readTypeStats
+        ds.readObject = readObjectStats
+
+        self.wrap(ds, "readKey", position, spec.STRING_TYPE)
+
+
+class CountingWriter:
+    # Forwards writes to con and counts them
+    def __init__(self, con, stats):
+        self.con = con
+        self.stats = stats
+        self.position = 0
+
+    def write(self, data):
+        n = self.con.write(data)
+        nBytes = memoryview(data).nbytes
+        self.position += nBytes
+        self.stats.writes += 1
+        self.stats.bytesWritten += nBytes
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self.con, name)
+
+
+class CountingReader:
+    # Forwards reads (and relative seeks) to con and counts them. Bytes read
+    # ahead and seeked back over are not counted as read.
+    def __init__(self, con, stats):
+        self.con = con
+        self.stats = stats
+        self.position = 0
+
+    def read(self, n=-1):
+        data = self.con.read(n)
+        self.position += len(data)
+        self.stats.reads += 1
+        self.stats.bytesRead += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        before = self.con.tell()
+        after = self.con.seek(offset, whence)
+        self.position += after - before
+        self.stats.bytesRead += after - before
+        return after
+
+    def __getattr__(self, name):
+        return getattr(self.con, name)
+
+
+class CountingJsonIterator(SerializerJsonIterator):
+    def __next__(self):
+        chunk = SerializerJsonIterator.__next__(self)
+        self.stats.writes += 1
+        self.stats.bytesWritten += len(chunk)
+        return chunk
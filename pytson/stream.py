@@ -0,0 +1,241 @@
+from collections import deque
+
+import numpy as np
+
+import pytson.spec as spec
+from pytson.serializer import typed_list_dtypes
+from pytson.deserializer import DeSerializer, length_struct
+from pytson.error import TsonError, TsonIncompleteError
+from pytson.compression import compression_types, Decompressor
+
+# Decoder states
+VERSION = 0
+HEAD = 1
+KEY = 2
+VALUE = 3
+TYPED_LIST = 4
+STRING_LIST = 5
+OBJECT = 6
+DONE = 7
+
+
+class TsonStreamDecoder:
+    # Push decoder: bytes are passed to feed() as they arrive and every
+    # top-level map entry is returned as a (key, value) pair as soon as it is
+    # complete. A document whose top level is not a map is returned as a
+    # single (None, value) pair.
+    #
+    # Typed lists are copied into their final array as chunks arrive, and
+    # string lists are decoded once their length-prefixed block is complete,
+    # so large columns are never re-parsed. Other values are parsed again when
+    # the pending data has doubled since the last incomplete attempt, which
+    # keeps the total work linear. Consumed bytes are skipped with an offset
+    # into the first pending chunk, which is only compacted once more than
+    # half of it has been consumed.
+    #
+    # A compressed stream (see pytson.compression) is detected from its first
+    # byte and decompressed as it is fed.
+    def __init__(self):
+        self.chunks = deque()
+        self.offset = 0
+        self.size = 0
+        self.state = VERSION
+        self.deserializer = None
+        self.decompressor = None
+
+        self.nEntries = 0
+        self.key = None
+
+        self.array = None
+        self.arrayBytes = None
+        self.arrayOffset = 0
+        self.stringListLength = 0
+
+        self.nextAttempt = 0
+
+    def feed(self, data):
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(data)
+        elif self.state == VERSION and self.size == 0 and len(data) > 0 and data[0] in compression_types.values():
+            self.decompressor = Decompressor(data[0])
+            data = self.decompressor.decompress(memoryview(data)[1:])
+
+        if len(data) > 0:
+            self.chunks.append(bytes(data))
+            self.size += len(data)
+
+        entries = []
+        while self.step(entries, False):
+            pass
+
+        return entries
+
+    # Signals the end of the stream and returns the remaining entries
+    def close(self):
+        if self.decompressor is not None:
+            data = self.decompressor.flush()
+            if len(data) > 0:
+                self.chunks.append(data)
+                self.size += len(data)
+
+        entries = []
+        while self.step(entries, True):
+            pass
+
+        if self.state != DONE:
+            raise TsonIncompleteError("Unexpected end of TSON stream.")
+
+        return entries
+
+    def isDone(self):
+        return self.state == DONE
+
+    # Pending data as a single bytes object, starting at self.offset
+    def peek(self):
+        if len(self.chunks) > 1:
+            self.chunks[0] = memoryview(self.chunks[0])[self.offset:]
+            data = b"".join(self.chunks)
+            self.chunks.clear()
+            self.chunks.append(data)
+            self.offset = 0
+
+        return self.chunks[0] if len(self.chunks) > 0 else b""
+
+    def consume(self, n):
+        self.offset += n
+        self.size -= n
+
+        head = self.chunks[0]
+        if self.offset >= len(head):
+            self.chunks.popleft()
+            self.offset = 0
+        elif self.offset > len(head) // 2:
+            self.chunks[0] = head[self.offset:]
+            self.offset = 0
+
+    def emit(self, entries, value):
+        entries.append((self.key, value))
+        self.key = None
+
+        self.nEntries -= 1
+        self.state = KEY if self.nEntries > 0 else DONE
+
+    # Advances the state machine, returns False when more data is needed
+    def step(self, entries, final):
+        if self.state == VERSION:
+            data = self.peek()
+            end = data.find(b"\x00", self.offset + 1)
+            if end < 0:
+                return False
+
+            # The deserializer checks the version and is then reused to
+            # parse values from the pending data
+            self.deserializer = DeSerializer(data[self.offset:end + 1], mode="buffer", decode=False)
+            self.consume(end + 1 - self.offset)
+            self.state = HEAD
+
+        elif self.state == HEAD:
+            if self.size < 1:
+                return False
+
+            if self.peek()[self.offset] == spec.MAP_TYPE:
+                if self.size < 5:
+                    return False
+
+                self.nEntries = length_struct.unpack_from(self.peek(), self.offset + 1)[0]
+                self.consume(5)
+                self.state = KEY if self.nEntries > 0 else DONE
+            else:
+                self.nEntries = 1
+                self.state = OBJECT
+
+        elif self.state == KEY:
+            if self.size < 1:
+                return False
+
+            data = self.peek()
+            start = self.offset
+            if data[start] != spec.STRING_TYPE:
+                raise TsonError("Key in map is not a string")
+
+            end = data.find(b"\x00", start + 1)
+            if end < 0:
+                return False
+
+            self.key = str(memoryview(data)[start + 1:end], "utf-8", errors="ignore")
+            self.consume(end + 1 - start)
+            self.state = VALUE
+
+        elif self.state == VALUE:
+            if self.size < 1:
+                return False
+
+            _type = self.peek()[self.offset]
+
+            if _type in typed_list_dtypes or _type == spec.LIST_STRING_TYPE:
+                if self.size < 5:
+                    return False
+
+                l = length_struct.unpack_from(self.peek(), self.offset + 1)[0]
+                self.consume(5)
+
+                if _type == spec.LIST_STRING_TYPE:
+                    self.stringListLength = l
+                    self.state = STRING_LIST
+                else:
+                    self.array = np.empty(l, dtype=typed_list_dtypes[_type])
+                    self.arrayBytes = memoryview(self.array).cast("B")
+                    self.arrayOffset = 0
+                    self.state = TYPED_LIST
+            else:
+                self.state = OBJECT
+
+        elif self.state == TYPED_LIST:
+            # Copy whatever has arrived into the array, chunk by chunk
+            nBytes = self.arrayBytes.nbytes
+            while self.arrayOffset < nBytes and len(self.chunks) > 0:
+                c = self.chunks[0]
+                k = min(len(c) - self.offset, nBytes - self.arrayOffset)
+
+                self.arrayBytes[self.arrayOffset:self.arrayOffset + k] = memoryview(c)[self.offset:self.offset + k]
+                self.arrayOffset += k
+                self.consume(k)
+
+            if self.arrayOffset < nBytes:
+                return False
+
+            array = self.array
+            self.array = None
+            self.arrayBytes = None
+            self.emit(entries, array)
+
+        elif self.state == STRING_LIST:
+            l = self.stringListLength
+            if self.size < l:
+                return False
+
+            block = memoryview(self.peek())[self.offset:self.offset + l]
+            self.consume(l)
+            self.emit(entries, str(block, "utf-8", errors="ignore").split("\x00")[:-1])
+
+        elif self.state == OBJECT:
+            if self.size == 0 or (self.size < self.nextAttempt and not final):
+                return False
+
+            ds = self.deserializer
+            ds.setBuffer(self.peek())
+            ds.offset = self.offset
+            try:
+                obj = ds.readObject()
+            except TsonIncompleteError:
+                self.nextAttempt = 2 * self.size
+                return False
+
+            self.nextAttempt = 0
+            self.consume(ds.offset - self.offset)
+            self.emit(entries, obj)
+
+        else:
+            return False
+
+        return True
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+# Decoded value with numpy arrays turned into lists, for comparisons
+def plain(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, list):
+        return [plain(o) for o in obj]
+    elif isinstance(obj, dict):
+        return {k: plain(v) for k, v in obj.items()}
+    return obj
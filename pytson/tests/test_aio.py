@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from pytson import encodeTSON
+from pytson.aio import encode_async, write_async, iter_entries_async, decode_async
+from pytson.error import TsonIncompleteError
+from pytson.tests import plain
+
+DOCUMENT = {"a": np.arange(5000, dtype=np.int32), "s": ["x", "é"] * 500, "m": {"k": [1, None]}}
+
+
+def readerOf(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+class Writer:
+    def __init__(self):
+        self.chunks = []
+        self.drains = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+
+    async def drain(self):
+        self.drains += 1
+
+
+async def collect(obj, chunkSize):
+    return [chunk async for chunk in encode_async(obj, chunkSize)]
+
+
+@pytest.mark.parametrize("obj", [DOCUMENT, [1, "a"], "text"])
+def test_encode_async(obj):
+    chunks = asyncio.run(collect(obj, 1000))
+
+    assert b"".join(chunks) == encodeTSON(obj).getvalue()
+
+
+def test_write_async():
+    writer = Writer()
+    asyncio.run(write_async(DOCUMENT, writer, 1000))
+
+    assert b"".join(writer.chunks) == encodeTSON(DOCUMENT).getvalue()
+    assert writer.drains == len(writer.chunks) > 1
+
+
+@pytest.mark.parametrize("obj", [DOCUMENT, [1, "a"], "text"])
+@pytest.mark.parametrize("chunkSize", [3, 1 << 18])
+def test_decode_async(obj, chunkSize):
+    async def decode():
+        return await decode_async(readerOf(encodeTSON(obj).getvalue()), chunkSize)
+
+    assert plain(asyncio.run(decode())) == plain(obj)
+
+
+def test_iter_entries_async():
+    async def entries():
+        return [k async for k, v in iter_entries_async(readerOf(encodeTSON(DOCUMENT).getvalue()), 100)]
+
+    assert asyncio.run(entries()) == list(DOCUMENT)
+
+
+def test_decode_async_truncated():
+    async def decode():
+        return await decode_async(readerOf(encodeTSON(DOCUMENT).getvalue()[:-1]))
+
+    with pytest.raises(TsonIncompleteError):
+        asyncio.run(decode())
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from pytson import decodeTSON
+from pytson.arrow import to_arrow, from_arrow, read_table, write_table
+from pytson.error import TsonError
+from pytson.serializer import EncodedStringList, encodeStringList
+
+STRINGS = ["row" + str(i) for i in range(19)] + ["gène", ""]
+
+
+def table():
+    return pa.table({
+        "i": pa.array(np.arange(21, dtype=np.int64)),
+        "f": pa.array(np.linspace(0, 1, 21, dtype=np.float32)),
+        "s": pa.array(STRINGS),
+    })
+
+
+def test_table_roundtrip():
+    t = table()
+    result = read_table(write_table(t).getvalue())
+
+    assert result.equals(t)
+
+
+def test_select_columns():
+    result = read_table(write_table(table()).getvalue(), columns=["s"])
+
+    assert result.column_names == ["s"]
+    assert result.column("s").to_pylist() == STRINGS
+
+
+def test_numeric_views():
+    arr = np.arange(10, dtype=np.int32)
+    a = to_arrow(arr)
+
+    assert a.type == pa.int32()
+    assert np.shares_memory(a.to_numpy(zero_copy_only=True), arr)
+    assert np.shares_memory(from_arrow(a), arr)
+
+
+@pytest.mark.parametrize("type", [pa.string(), pa.large_string()])
+def test_string_blocks(type):
+    array = pa.array(STRINGS, type=type)
+    block = from_arrow(array)
+
+    assert isinstance(block, EncodedStringList)
+    assert block == encodeStringList(STRINGS)
+    assert to_arrow(block).to_pylist() == STRINGS
+
+
+def test_sliced_string_array():
+    array = pa.array(STRINGS).slice(3, 5)
+
+    assert to_arrow(from_arrow(array)).to_pylist() == STRINGS[3:8]
+
+
+def test_written_strings_decode():
+    data = write_table(table()).getvalue()
+
+    assert decodeTSON(data)["s"] == STRINGS
+
+
+def test_nulls():
+    with pytest.raises(TsonError):
+        from_arrow(pa.array(["a", None]))
+    with pytest.raises(TsonError):
+        from_arrow(pa.array([1, None]))
+
+    assert np.isnan(from_arrow(pa.array([1.5, None]))[1])
+
+
+def test_other_types():
+    assert from_arrow(pa.array([True, False])) == [True, False]
@@ -0,0 +1,47 @@
+import mmap
+
+import numpy as np
+import pytest
+
+from pytson import DeSerializer, encodeTSON, decodeTSON
+from pytson.error import TsonIncompleteError
+
+DOCUMENT = {"a": np.arange(100, dtype=np.int32), "b": "text", "c": [1.5, 2.5]}
+
+
+@pytest.mark.parametrize("wrap", [bytes, memoryview])
+def test_numeric_lists_are_views(wrap):
+    data = encodeTSON(DOCUMENT).getvalue()
+    decoded = decodeTSON(wrap(data))
+
+    assert np.shares_memory(decoded["a"], np.frombuffer(data, dtype=np.uint8))
+    assert not decoded["a"].flags.writeable
+    assert decoded["a"].tolist() == list(range(100))
+
+
+def test_mmap(tmp_path):
+    path = tmp_path / "doc.tson"
+    path.write_bytes(encodeTSON(DOCUMENT).getvalue())
+
+    decoded = decodeTSON(str(path), mmap=True)
+    assert decoded["a"].tolist() == list(range(100))
+    assert decoded["b"] == "text"
+
+    with open(path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert DeSerializer(m, mode="buffer").getObject()["c"].tolist() == [1.5, 2.5]
+
+
+def test_bytearray_is_not_aliased():
+    buf = bytearray(encodeTSON(DOCUMENT).getvalue())
+    decoded = decodeTSON(buf)
+
+    buf.clear()
+    assert decoded["a"].tolist() == list(range(100))
+
+
+def test_truncated_buffer():
+    data = encodeTSON(DOCUMENT).getvalue()
+
+    with pytest.raises(TsonIncompleteError):
+        DeSerializer(data[:-10], mode="buffer")
@@ -0,0 +1,87 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from pytson import DeSerializer, SerializerJsonIterator, TsonStreamDecoder, encodeTSON, decodeTSON
+from pytson.compression import compression_types
+from pytson.error import TsonError
+from pytson.tests import plain
+
+CODECS = list(compression_types)
+
+DOCUMENT = {
+    "name": "gène",
+    "ints": list(range(1000)),
+    "array": np.arange(300, dtype=np.float64),
+    "strings": ["a", "bc", "é"] * 100,
+    "nested": {"a": [1, "b", None], "c": {"d": True}},
+}
+
+
+@pytest.mark.parametrize("mode", ["old", "new", "buffer"])
+@pytest.mark.parametrize("compression", CODECS)
+def test_compressed_roundtrip(compression, mode):
+    data = encodeTSON(DOCUMENT, compression=compression).getvalue()
+    con = data if mode == "buffer" else io.BytesIO(data)
+
+    assert data[0] == compression_types[compression]
+    assert plain(DeSerializer(con, mode=mode).getObject()) == plain(DOCUMENT)
+
+
+@pytest.mark.parametrize("compression", CODECS)
+def test_compressed_iterator(compression):
+    data = b"".join(SerializerJsonIterator(DOCUMENT, 100, compression=compression))
+
+    assert plain(decodeTSON(data)) == plain(DOCUMENT)
+
+
+@pytest.mark.parametrize("compression", CODECS)
+def test_compressed_stream_decoder(compression):
+    data = encodeTSON(DOCUMENT, compression=compression).getvalue()
+    decoder = TsonStreamDecoder()
+
+    entries = []
+    for i in range(0, len(data), 5):
+        entries += decoder.feed(data[i:i + 5])
+    entries += decoder.close()
+
+    assert plain(dict(entries)) == plain(DOCUMENT)
+
+
+def test_compression_level():
+    fast = encodeTSON(DOCUMENT, compression="zlib", level=1).getvalue()
+    best = encodeTSON(DOCUMENT, compression="zlib", level=9).getvalue()
+
+    assert len(best) <= len(fast)
+    assert plain(decodeTSON(fast)) == plain(decodeTSON(best))
+
+
+def test_unknown_compression():
+    with pytest.raises(TsonError):
+        encodeTSON(DOCUMENT, compression="zstd")
+
+
+def test_non_seekable_stream():
+    # Consecutive documents on a pipe, which can neither seek nor peek
+    docs = [{"a": "x", "b": [1, 2]}, ["c", 3], "d"]
+    r, w = os.pipe()
+
+    def write():
+        with os.fdopen(w, "wb") as f:
+            for doc in docs:
+                f.write(encodeTSON(doc).getvalue())
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        with os.fdopen(r, "rb", buffering=0) as f:
+            assert not f.seekable() and not hasattr(f, "peek")
+            decoded = [plain(DeSerializer(f).getObject()) for _ in docs]
+            assert f.read() == b""
+    finally:
+        writer.join()
+
+    assert decoded == docs
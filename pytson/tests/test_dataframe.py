@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from pytson import encodeTSON, decodeTSON
+from pytson.dataframe import to_dataframe, from_dataframe
+from pytson.error import TsonError
+
+
+def frame():
+    return pd.DataFrame({
+        "i": np.arange(50, dtype=np.int32),
+        "f": np.linspace(0, 1, 50),
+        "s": ["row" + str(i) for i in range(50)],
+        "c": pd.Categorical(["low", "high"] * 25),
+    })
+
+
+def test_roundtrip():
+    df = frame()
+    result = to_dataframe(from_dataframe(df).getvalue())
+
+    assert list(result.columns) == list(df.columns)
+    assert result["i"].dtype == np.int32
+    assert result["i"].tolist() == df["i"].tolist()
+    assert result["f"].tolist() == df["f"].tolist()
+    assert result["s"].tolist() == df["s"].tolist()
+    assert result["c"].tolist() == df["c"].tolist()
+
+
+def test_factors():
+    df = frame()
+    data = from_dataframe(df, factors=True).getvalue()
+
+    assert len(data) < len(from_dataframe(df).getvalue())
+
+    result = to_dataframe(data)
+    assert isinstance(result["c"].dtype, pd.CategoricalDtype)
+    assert result["c"].tolist() == df["c"].tolist()
+
+
+def test_empty_categorical():
+    df = pd.DataFrame({"c": pd.Categorical([], categories=["a", "b"])})
+    data = from_dataframe(df, factors=True).getvalue()
+
+    assert decodeTSON(data, factors="list") == {"c": []}
+    assert len(to_dataframe(data)) == 0
+
+
+def test_select_columns(tmp_path):
+    path = tmp_path / "table.tson"
+    path.write_bytes(from_dataframe(frame()).getvalue())
+
+    result = to_dataframe(str(path), columns=["s", "i"])
+    assert list(result.columns) == ["s", "i"]
+
+    with open(path, "rb") as f:
+        assert len(to_dataframe(f)) == 50
+
+
+def test_from_plain_table():
+    result = to_dataframe(io.BytesIO(encodeTSON({"a": [1, 2], "b": ["x", "y"]}).getvalue()))
+
+    assert result.to_dict("list") == {"a": [1, 2], "b": ["x", "y"]}
+
+
+def test_column_names_must_be_strings():
+    with pytest.raises(TsonError):
+        from_dataframe(pd.DataFrame({0: [1, 2]}))
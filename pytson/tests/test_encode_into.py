@@ -0,0 +1,94 @@
+import mmap
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import pytson.serializer
+from pytson import encodeTSON, decodeTSON, tson_size, encode_into
+from pytson.error import TsonError
+from pytson.serializer import EncodedStringList, encodeStringList
+
+DOCUMENTS = [
+    None,
+    "gène",
+    7,
+    2**40,
+    [1, 2.5],
+    [],
+    {"ascii": ["a", "bc"] * 10, "unicode": ["é", "ü"] * 10, "é": "ü"},
+    {"ints": list(range(300)), "array": np.arange(5.0), "nested": [{"k": None}, [True]]},
+    {"block": encodeStringList(["x", "y"])},
+]
+
+
+@pytest.mark.parametrize("obj", DOCUMENTS)
+def test_tson_size(obj):
+    assert tson_size(obj) == len(encodeTSON(obj).getvalue())
+    assert tson_size(obj, header=False) == len(pytson.serializer.encodeObject(obj))
+
+
+@pytest.mark.parametrize("obj", DOCUMENTS)
+def test_encode_into(obj):
+    expected = encodeTSON(obj).getvalue()
+    buffer = bytearray(b"\xff" * (len(expected) + 10))
+
+    assert encode_into(obj, buffer, 3) == 3 + len(expected)
+    assert bytes(buffer[3:3 + len(expected)]) == expected
+    assert buffer[:3] == b"\xff" * 3 and buffer[3 + len(expected):] == b"\xff" * 7
+
+
+def test_encode_into_mmap():
+    obj = DOCUMENTS[-2]
+    size = tson_size(obj)
+    m = mmap.mmap(-1, size)
+
+    assert encode_into(obj, m) == size
+    assert decodeTSON(m[:])["ints"].tolist() == list(range(300))
+    m.close()
+
+
+def test_buffer_too_small():
+    obj = DOCUMENTS[-2]
+    buffer = bytearray(tson_size(obj) - 1)
+
+    with pytest.raises(TsonError):
+        encode_into(obj, buffer)
+    assert buffer == bytearray(len(buffer))
+
+
+def test_readonly_buffer():
+    with pytest.raises(TsonError):
+        encode_into([1], bytes(100))
+
+
+def test_strings_and_lists_converted_once():
+    obj = {"ascii": ["a", "bc"] * 10, "unicode": ["é", "ü"] * 10, "ints": list(range(300)), "array": np.arange(5.0)}
+    buffer = bytearray(tson_size(obj))
+    calls = {"toTypedList": 0, "joinStrings": 0}
+
+    def counting(name):
+        original = getattr(pytson.serializer, name)
+
+        def wrapper(*args):
+            calls[name] += 1
+            return original(*args)
+        return wrapper
+
+    with mock.patch.object(pytson.serializer, "toTypedList", counting("toTypedList")), \
+            mock.patch.object(pytson.serializer, "joinStrings", counting("joinStrings")):
+        encode_into(obj, buffer)
+
+    # Each numeric list is converted and each string list encoded once, the
+    # non-ASCII one when sizing and the ASCII one when writing
+    assert calls == {"toTypedList": 2, "joinStrings": 2}
+    assert bytes(buffer) == encodeTSON(obj).getvalue()
+
+
+def test_encoded_string_list():
+    block = encodeStringList(["a", "é"])
+    assert isinstance(block, EncodedStringList)
+
+    buffer = bytearray(tson_size({"b": block}))
+    encode_into({"b": block}, buffer)
+    assert decodeTSON(bytes(buffer)) == {"b": ["a", "é"]}
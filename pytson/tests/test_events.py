@@ -0,0 +1,90 @@
+import io
+
+import numpy as np
+import pytest
+
+from pytson import encodeTSON, iter_events
+from pytson.tests import plain
+
+DOCUMENT = {
+    "n": None,
+    "b": True,
+    "i": 3,
+    "d": 1.5,
+    "s": "gène",
+    "l": [1, "a", [None]],
+    "m": {"k": "v"},
+    "a": np.arange(1000, dtype=np.int16),
+    "strings": ["abc", "é", "", "xyz"] * 100,
+}
+
+
+# Rebuilds the document from its events
+def build(events):
+    event, value = next(events)
+
+    if event == "start_map":
+        m = {}
+        for _ in range(value):
+            event, key = next(events)
+            assert event == "key"
+            m[key] = build(events)
+        assert next(events) == ("end_map", None)
+        return m
+    elif event == "start_list":
+        l = [build(events) for _ in range(value)]
+        assert next(events) == ("end_list", None)
+        return l
+    elif event == "start_typed_array":
+        dtype, length = value
+        chunks = []
+        for event, chunk in events:
+            if event == "end_typed_array":
+                break
+            chunks.append(chunk)
+        arr = np.concatenate(chunks) if chunks else np.empty(0, dtype)
+        assert len(arr) == length
+        return arr
+    elif event == "start_string_list":
+        strings = []
+        for event, chunk in events:
+            if event == "end_string_list":
+                break
+            strings += chunk
+        return strings
+
+    return value
+
+
+@pytest.mark.parametrize("source", ["bytes", "stream"])
+@pytest.mark.parametrize("chunkSize", [1, 7, 64, 1 << 16])
+def test_events_rebuild_document(source, chunkSize):
+    data = encodeTSON(DOCUMENT).getvalue()
+    events = iter_events(data if source == "bytes" else io.BytesIO(data), chunkSize)
+
+    assert plain(build(events)) == plain(DOCUMENT)
+    assert next(events, None) is None
+
+
+def test_event_sequence():
+    events = list(iter_events(encodeTSON({"a": [1, "x"], "b": None}).getvalue()))
+
+    assert events == [
+        ("start_map", 2),
+        ("key", "a"),
+        ("start_list", 2),
+        ("integer", 1),
+        ("string", "x"),
+        ("end_list", None),
+        ("key", "b"),
+        ("null", None),
+        ("end_map", None),
+    ]
+
+
+def test_chunk_sizes():
+    events = list(iter_events(encodeTSON({"a": np.arange(100, dtype=np.int32)}).getvalue(), 40))
+    chunks = [value for event, value in events if event == "typed_array_chunk"]
+
+    assert [len(c) for c in chunks] == [10] * 10
+    assert all(c.dtype == np.int32 for c in chunks)
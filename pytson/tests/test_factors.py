@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from pytson import encodeTSON, decodeTSON
+from pytson.serializer import FACTOR_MIN_LENGTH, FACTOR_LEVELS_KEY, FACTOR_CODES_KEY
+
+COLUMN = ["low", "high", "mid"] * 20
+
+
+def test_factor_encoding():
+    data = encodeTSON({"c": COLUMN}, factors=True).getvalue()
+
+    assert len(data) < len(encodeTSON({"c": COLUMN}).getvalue())
+
+    # Readers without factor support get the standard map
+    raw = decodeTSON(data)["c"]
+    assert raw[FACTOR_LEVELS_KEY] == ["low", "high", "mid"]
+    assert raw[FACTOR_CODES_KEY].tolist() == [0, 1, 2] * 20
+
+
+def test_factor_forms():
+    data = encodeTSON({"c": COLUMN}, factors=True).getvalue()
+
+    assert decodeTSON(data, factors="list")["c"] == COLUMN
+
+    codes, levels = decodeTSON(data, factors="tuple")["c"]
+    assert [levels[c] for c in codes] == COLUMN
+
+
+def test_factor_categorical():
+    pd = pytest.importorskip("pandas")
+    data = encodeTSON({"c": COLUMN}, factors=True).getvalue()
+
+    c = decodeTSON(data, factors="categorical")["c"]
+    assert isinstance(c, pd.Categorical)
+    assert list(c) == COLUMN
+
+
+def test_not_factored():
+    # Short lists, and lists with many distinct values, stay string lists
+    short = ["a", "b"] * (FACTOR_MIN_LENGTH // 2 - 1)
+    distinct = [str(i) for i in range(100)]
+
+    for column in (short, distinct):
+        assert decodeTSON(encodeTSON({"c": column}, factors=True).getvalue(), factors="list")["c"] == column
+
+
+@pytest.mark.parametrize("form", ["list", "tuple", "categorical"])
+def test_empty_factor(form):
+    if form == "categorical":
+        pytest.importorskip("pandas")
+
+    doc = {"c": {FACTOR_LEVELS_KEY: ["a", "b"], FACTOR_CODES_KEY: np.array([], dtype=np.int8)}}
+    c = decodeTSON(encodeTSON(doc).getvalue(), factors=form)["c"]
+
+    if form == "tuple":
+        assert len(c[0]) == 0 and c[1] == ["a", "b"]
+    else:
+        assert len(c) == 0
+
+
+def test_missing_codes():
+    doc = {"c": {FACTOR_LEVELS_KEY: ["a"], FACTOR_CODES_KEY: np.array([0, -1, 0], dtype=np.int8)}}
+
+    assert decodeTSON(encodeTSON(doc).getvalue(), factors="list")["c"] == ["a", None, "a"]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from pytson import encodeTSON, decodeTSON, tson_size
+from pytson.error import TsonError
+
+
+@pytest.mark.parametrize("values, dtype", [
+    ([-1, 1, 127], np.int8),
+    ([0, 255], np.uint8),
+    ([-300, 300], np.int16),
+    ([0, 65535], np.uint16),
+    ([-2**31, 2**31 - 1], np.int32),
+    ([0, 2**32 - 1], np.uint32),
+    ([-2**63, 2**63 - 1], np.int64),
+    ([0, 2**64 - 1], np.uint64),
+    ([2**63, 1], np.uint64),
+])
+def test_integer_list_narrowing(values, dtype):
+    decoded = decodeTSON(encodeTSON({"l": values}).getvalue())["l"]
+
+    assert decoded.dtype == dtype
+    assert decoded.tolist() == values
+
+
+@pytest.mark.parametrize("values", [[2**64], [-1, 2**63], [-2**63 - 1]])
+def test_integer_list_out_of_range(values):
+    with pytest.raises(TsonError):
+        encodeTSON({"l": values})
+
+
+@pytest.mark.parametrize("dtype", [np.int64, np.uint64])
+def test_64_bit_arrays(dtype):
+    info = np.iinfo(dtype)
+    arr = np.array([info.min, 0, info.max], dtype=dtype)
+    decoded = decodeTSON(encodeTSON({"a": arr}).getvalue())["a"]
+
+    assert decoded.dtype == dtype
+    assert decoded.tolist() == arr.tolist()
+
+
+@pytest.mark.parametrize("value", [0, -2**31, 2**31 - 1, np.int64(5), np.uint64(7), np.int8(-3)])
+def test_scalar_integer(value):
+    decoded = decodeTSON(encodeTSON(value).getvalue())
+
+    assert type(decoded) is int
+    assert decoded == value
+
+
+@pytest.mark.parametrize("value", [2**31, -2**31 - 1, 2**53, -2**53, np.int64(2**40), np.uint64(2**52)])
+def test_scalar_double_fallback(value):
+    # Outside int32, exact as a double
+    data = encodeTSON(value).getvalue()
+
+    assert decodeTSON(data) == value
+    assert tson_size(value) == len(data)
+
+
+@pytest.mark.parametrize("value", [2**53 + 1, -2**53 - 1, 2**64, np.uint64(2**64 - 1)])
+def test_scalar_out_of_range(value):
+    with pytest.raises(TsonError):
+        encodeTSON(value)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import pytson.spec as spec
+from pytson import SerializerJsonIterator, encodeTSON, decodeTSON
+from pytson.serializer import head_struct
+from pytson.tests import plain
+
+DOCUMENT = {
+    "int64": np.arange(5000, dtype=np.int64),
+    "float32": np.linspace(0, 1, 3000, dtype=np.float32),
+    "uint16": np.arange(2000, dtype=np.uint16),
+    "ints": list(range(1000)),
+    "strings": ["a", "bc", "é"] * 500,
+    "nested": [{"a": 1}, [2, "b"], None],
+    "scalar": 2.5,
+}
+
+
+@pytest.mark.parametrize("chunkSize", [1, 7, 100, 4096, 8192, 1 << 20])
+def test_chunks_are_bytes(chunkSize):
+    chunks = list(SerializerJsonIterator(DOCUMENT, chunkSize))
+
+    assert all(type(chunk) is bytes for chunk in chunks)
+    assert b"".join(chunks) == encodeTSON(DOCUMENT).getvalue()
+
+
+def test_typed_list_dtypes():
+    decoded = decodeTSON(b"".join(SerializerJsonIterator(DOCUMENT, 1000)))
+
+    for k in ("int64", "float32", "uint16"):
+        assert decoded[k].dtype == DOCUMENT[k].dtype
+        assert plain(decoded[k]) == plain(DOCUMENT[k])
+
+
+def nested(depth):
+    if depth == 0:
+        return {"leaf": [1, "a", None, 2.5]}
+    return {"level": depth, "children": [nested(depth - 1), [nested(depth - 1)]], "empty": [], "map": {}}
+
+
+@pytest.mark.parametrize("obj", [
+    nested(6),
+    {"lists": [[i, [str(i), [None]]] for i in range(2000)]},
+    {"maps": [{"k": i, "v": {"w": [i]}} for i in range(2000)]},
+    {},
+])
+def test_nested_traversal(obj):
+    assert b"".join(SerializerJsonIterator(obj, 100)) == encodeTSON(obj).getvalue()
+
+
+def test_deep_nesting():
+    # The traversal keeps its own stack, nesting is not limited by recursion
+    obj = {"a": []}
+    inner = obj["a"]
+    for _ in range(5000):
+        inner.append([])
+        inner = inner[0]
+
+    data = b"".join(SerializerJsonIterator(obj, 1000))
+    assert data.endswith(head_struct.pack(spec.LIST_TYPE, 1) * 4999 + head_struct.pack(spec.LIST_TYPE, 0))
+
+
+@pytest.mark.parametrize("chunkSize", [1, 5, 100, 4096, 8192])
+def test_exact_chunks(chunkSize):
+    chunks = list(SerializerJsonIterator(DOCUMENT, chunkSize, exact=True))
+
+    assert all(len(chunk) == chunkSize for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= chunkSize
+    assert b"".join(chunks) == encodeTSON(DOCUMENT).getvalue()
+
+
+def test_chunks_near_chunk_size():
+    # Without exact, a chunk only exceeds chunkSize by the last value added
+    chunks = list(SerializerJsonIterator({"s": ["x" * 10] * 1000, "n": list(range(1000))}, 100))
+
+    assert all(len(chunk) <= 100 + 16 for chunk in chunks)
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from pytson import DeSerializer, encodeTSON
+from pytson.deserializer import KEY_CACHE_MAX_LENGTH
+
+ROWS = [{"id": i, "name": "n" + str(i), "gène": True} for i in range(100)]
+
+
+@pytest.mark.parametrize("mode", ["old", "new", "buffer"])
+def test_keys_are_shared(mode):
+    data = encodeTSON(ROWS).getvalue()
+    rows = DeSerializer(data if mode == "buffer" else io.BytesIO(data), mode=mode).getObject()
+
+    assert rows == ROWS
+    keys = [next(iter(row)) for row in rows]
+    assert all(k is keys[0] for k in keys)
+
+
+def test_cache_disabled():
+    data = encodeTSON(ROWS).getvalue()
+    ds = DeSerializer(data, mode="buffer", keyCacheSize=0)
+
+    assert ds.keyCache is None
+    assert ds.getObject() == ROWS
+
+
+def test_cache_eviction():
+    doc = {"k" + str(i): i for i in range(10)}
+    ds = DeSerializer(encodeTSON(doc).getvalue(), mode="buffer", keyCacheSize=4)
+
+    assert ds.getObject() == doc
+    # The oldest keys are evicted first
+    assert [str(k, "utf-8") for k in ds.keyCache] == ["k6", "k7", "k8", "k9"]
+
+
+def test_long_keys_not_cached():
+    long = "x" * (KEY_CACHE_MAX_LENGTH + 1)
+    ds = DeSerializer(encodeTSON({long: 1, "short": 2}).getvalue(), mode="buffer")
+
+    assert ds.getObject() == {long: 1, "short": 2}
+    assert list(ds.keyCache) == [b"short"]
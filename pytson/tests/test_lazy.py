@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pytest
+
+import pytson.lazy
+import pytson.spec as spec
+from pytson import LazyTsonDocument, encodeTSON
+from pytson.error import TsonError
+
+DOCUMENT = {"a": np.arange(10), "b": ["x", "y"], "c": {"d": 1}, "e": "text"}
+
+
+def writeDocument(path, obj=DOCUMENT):
+    path.write_bytes(encodeTSON(obj).getvalue())
+    return str(path)
+
+
+def test_index_reused(tmp_path, monkeypatch):
+    path = writeDocument(tmp_path / "doc.tson")
+    indexFile = str(tmp_path / "doc.idx")
+
+    index = LazyTsonDocument(path, indexFile=indexFile).index
+    assert os.path.exists(indexFile)
+
+    def scan(self):
+        raise AssertionError("index was not loaded")
+
+    monkeypatch.setattr(LazyTsonDocument, "scan", scan)
+    doc = LazyTsonDocument(path, indexFile=indexFile)
+    assert doc.index == index
+    assert doc["e"] == "text"
+
+
+def test_stale_index(tmp_path):
+    path = writeDocument(tmp_path / "doc.tson", {"a": "xx", "b": "y"})
+    indexFile = str(tmp_path / "doc.idx")
+    LazyTsonDocument(path, indexFile=indexFile)
+
+    # Same size, different layout and modification time
+    writeDocument(tmp_path / "doc.tson", {"b": "y", "a": "xx"})
+    os.utime(path, ns=(0, 1))
+
+    assert dict(LazyTsonDocument(path, indexFile=indexFile)) == {"b": "y", "a": "xx"}
+
+
+@pytest.mark.parametrize("sidecar", [{"format": 1}, {"format": 1, "document": 3}, [1, 2], "text"])
+def test_malformed_index(tmp_path, sidecar):
+    path = writeDocument(tmp_path / "doc.tson")
+    indexFile = tmp_path / "doc.idx"
+    indexFile.write_bytes(encodeTSON(sidecar).getvalue())
+
+    doc = LazyTsonDocument(path, indexFile=str(indexFile))
+    assert doc["e"] == "text"
+
+    # The sidecar is rewritten
+    assert LazyTsonDocument(path, indexFile=str(indexFile)).index == doc.index
+
+
+def test_corrupt_index(tmp_path):
+    path = writeDocument(tmp_path / "doc.tson")
+    indexFile = tmp_path / "doc.idx"
+    indexFile.write_bytes(b"\x01not an index")
+
+    assert LazyTsonDocument(path, indexFile=str(indexFile))["e"] == "text"
+
+
+def test_index_requires_path(tmp_path):
+    with pytest.raises(TsonError):
+        LazyTsonDocument(encodeTSON(DOCUMENT).getvalue(), indexFile=str(tmp_path / "doc.idx"))
+
+
+def test_failed_save_leaves_no_file(tmp_path, monkeypatch):
+    path = writeDocument(tmp_path / "doc.tson")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pytson.lazy, "Serializer", fail)
+    with pytest.raises(OSError):
+        LazyTsonDocument(path, indexFile=str(tmp_path / "doc.idx"))
+
+    assert os.listdir(tmp_path) == ["doc.tson"]
+
+
+def test_lazy_access():
+    doc = LazyTsonDocument(encodeTSON(DOCUMENT).getvalue())
+
+    assert len(doc) == 4
+    assert list(doc) == list(DOCUMENT)
+    assert "b" in doc and "z" not in doc
+    assert doc["e"] == "text"
+    assert doc["a"].tolist() == list(range(10))
+    assert doc["c"] == {"d": 1}
+    with pytest.raises(KeyError):
+        doc["z"]
+
+
+def test_lazy_decode(tmp_path):
+    path = writeDocument(tmp_path / "doc.tson")
+    decoded = LazyTsonDocument(path).decode()
+
+    assert list(decoded) == list(DOCUMENT)
+    assert decoded["b"] == ["x", "y"]
+
+
+def test_lazy_metadata():
+    doc = LazyTsonDocument(encodeTSON(DOCUMENT).getvalue())
+
+    assert doc.getType("b") == spec.LIST_STRING_TYPE
+    assert doc.getLength("a") == 10
+    assert bytes(doc.getStringListBlock("b")) == b"x\x00y\x00"
+    with pytest.raises(TsonError):
+        doc.getStringListBlock("a")
+
+
+def test_lazy_compressed():
+    doc = LazyTsonDocument(encodeTSON(DOCUMENT, compression="zlib").getvalue())
+
+    assert doc["e"] == "text"
+    assert doc["b"] == ["x", "y"]
+
+
+def test_lazy_requires_map():
+    with pytest.raises(TsonError):
+        LazyTsonDocument(encodeTSON([1, 2]).getvalue())
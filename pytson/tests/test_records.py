@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+import pytest
+
+from pytson import encode_many, iter_decode
+from pytson.error import TsonError, TsonIncompleteError
+from pytson.tests import plain
+
+RECORDS = [{"id": i, "tags": ["a", "b"], "value": i * 0.5} for i in range(50)] + [[1, 2], "x", None]
+
+
+def encodeRecords(records=RECORDS, **kwargs):
+    out = io.BytesIO()
+    assert encode_many(records, out, **kwargs) == len(records)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("source", ["bytes", "stream"])
+def test_record_stream(source):
+    data = encodeRecords()
+    records = iter_decode(data if source == "bytes" else io.BytesIO(data))
+
+    assert [plain(r) for r in records] == RECORDS
+
+
+def test_record_stream_is_lazy():
+    records = iter_decode(io.BytesIO(encodeRecords()))
+
+    assert plain(next(records)) == RECORDS[0]
+    assert plain(next(records)) == RECORDS[1]
+
+
+def test_empty_record_stream():
+    assert list(iter_decode(encodeRecords([]))) == []
+
+
+def test_factor_records():
+    records = [{"c": ["x", "y"] * 20, "n": np.arange(3)}] * 3
+    data = encodeRecords(records, factors=True)
+
+    assert [plain(r) for r in iter_decode(data, factors="list")] == plain(records)
+
+
+@pytest.mark.parametrize("source", ["bytes", "stream"])
+def test_record_stream_truncated(source):
+    data = encodeRecords()[:-3]
+
+    with pytest.raises(TsonIncompleteError):
+        list(iter_decode(data if source == "bytes" else io.BytesIO(data)))
+
+
+def test_record_length_mismatch():
+    data = bytearray(encodeRecords([1, 2]))
+    # Length of the first record, after the version, one byte too long
+    data[7] += 1
+
+    with pytest.raises(TsonError):
+        list(iter_decode(bytes(data)))
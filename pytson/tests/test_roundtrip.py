@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import pytest
+
+from pytson import DeSerializer, encodeTSON, decodeTSON
+from pytson.error import TsonIncompleteError
+from pytson.tests import plain
+
+DOCUMENTS = [
+    None,
+    "",
+    "gène",
+    42,
+    -2**31,
+    2**40,
+    1.5,
+    True,
+    [],
+    {},
+    [1, "a", None, 2.5, False, [1, 2], {"k": "v"}],
+    {
+        "scalar": 1,
+        "string": "value",
+        "unicode": "ü" * 100,
+        "ints": list(range(-5, 300)),
+        "floats": [0.5, 1.5, -2.25],
+        "mixed": [1, 2.5],
+        "strings": ["a", "", "é", "abc"] * 50,
+        "nested": {"a": {"b": [None, True, "c"]}},
+        "empty": [],
+    },
+    {"array": np.arange(1000, dtype=np.int64), "float32": np.linspace(0, 1, 17, dtype=np.float32)},
+]
+
+
+@pytest.mark.parametrize("mode", ["old", "new", "buffer"])
+@pytest.mark.parametrize("obj", DOCUMENTS)
+def test_roundtrip(obj, mode):
+    data = encodeTSON(obj).getvalue()
+    con = data if mode == "buffer" else io.BytesIO(data)
+
+    assert plain(DeSerializer(con, mode=mode).getObject()) == plain(obj)
+
+
+@pytest.mark.parametrize("mode", ["old", "new"])
+def test_small_chunks(mode):
+    # Strings and lists spanning several chunks
+    obj = {"s": "x" * 100, "l": ["abc", "é"] * 100, "n": list(range(100))}
+    data = encodeTSON(obj).getvalue()
+
+    assert plain(DeSerializer(io.BytesIO(data), mode=mode, chunk=7).getObject()) == obj
+
+
+@pytest.mark.parametrize("obj", DOCUMENTS)
+def test_decode_tson(obj):
+    assert plain(decodeTSON(encodeTSON(obj).getvalue())) == plain(obj)
+
+
+@pytest.mark.parametrize("obj", [{"a": "x" * 10, "b": ["c", "d"], "c": [1, 2, 3]}, ["a", "b", 1]])
+def test_truncated(obj):
+    data = encodeTSON(obj).getvalue()
+
+    for n in range(len(data) - 1, len(data) - 4, -1):
+        with pytest.raises(TsonIncompleteError):
+            decodeTSON(data[:n])
@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+import pytest
+
+from pytson import Serializer, encodeTSON, decodeTSON
+from pytson.error import TsonError
+from pytson.serializer import DIRECT_WRITE_SIZE, STRING_BATCH_SIZE, EncodedStringList, encodeStringList
+from pytson.tests import plain
+
+
+class RecordingWriter(io.BytesIO):
+    # Records the size of every write
+    def __init__(self):
+        io.BytesIO.__init__(self)
+        self.sizes = []
+
+    def write(self, data):
+        self.sizes.append(memoryview(data).nbytes)
+        return io.BytesIO.write(self, data)
+
+
+@pytest.mark.parametrize("obj", [
+    {"k" + str(i): i for i in range(50000)},
+    [{"a": "x" * 10, "b": 1.5} for i in range(20000)],
+    {"s": ["x" * 20] * (3 * STRING_BATCH_SIZE + 5)},
+    {"s": ["é" * 10] * (3 * STRING_BATCH_SIZE + 5)},
+])
+def test_output_is_streamed(obj):
+    con = RecordingWriter()
+    Serializer(obj, con)
+
+    assert len(con.sizes) > 1
+    # Buffered writes stop at the first element past the flush size
+    assert max(con.sizes) < 2 * DIRECT_WRITE_SIZE + 1024 * 1024
+    assert plain(decodeTSON(con.getvalue())) == plain(obj)
+
+
+def test_large_typed_list_written_directly():
+    arr = np.arange(100000, dtype=np.int64)
+    con = RecordingWriter()
+    Serializer({"a": arr}, con)
+
+    assert arr.nbytes in con.sizes
+    assert decodeTSON(con.getvalue())["a"].tolist() == arr.tolist()
+
+
+@pytest.mark.parametrize("strings", [[], ["a"], ["", "b", "gène"], ["x"] * (STRING_BATCH_SIZE + 1)])
+def test_string_list_block(strings):
+    block = encodeStringList(strings)
+
+    assert isinstance(block, EncodedStringList)
+    assert block == b"".join(s.encode("utf-8") + b"\x00" for s in strings)
+    if strings:
+        assert decodeTSON(encodeTSON({"s": block}).getvalue())["s"] == strings
+
+
+@pytest.mark.parametrize("arr", [
+    np.arange(10, dtype=">i4"),
+    np.arange(20, dtype=np.float64)[::2],
+    np.arange(12, dtype=np.uint16).reshape(3, 4)[:, 1],
+    np.array([], dtype=np.float32),
+])
+def test_typed_list_layouts(arr):
+    # Big-endian and non-contiguous arrays are written little-endian and
+    # contiguous
+    decoded = decodeTSON(encodeTSON({"a": arr}).getvalue())["a"]
+
+    assert plain(decoded) == arr.tolist()
+    # Empty arrays are written as empty generic lists
+    if len(arr) > 0:
+        assert decoded.dtype == arr.dtype.newbyteorder("<")
+
+
+def test_numpy_scalars_in_lists():
+    decoded = decodeTSON(encodeTSON({"l": [np.float32(1.5), np.float32(2.5)]}).getvalue())["l"]
+
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == [1.5, 2.5]
+
+
+class Text(str):
+    pass
+
+
+class Table(dict):
+    pass
+
+
+def test_subclass_dispatch():
+    obj = Table(a=Text("x"), b=[Text("y")], c=True)
+    s = Serializer(obj)
+
+    assert decodeTSON(s.getBytes().getvalue()) == {"a": "x", "b": ["y"], "c": True}
+    # Resolved subclasses are cached on the instance, not on the class
+    assert Text in s.handlers and Table in s.handlers
+    assert Text not in Serializer.getHandlerTable()
+    assert Serializer.getHandlerTable() is Serializer({}).handlers
+
+
+def test_unknown_type():
+    with pytest.raises(TsonError):
+        encodeTSON({"a": object()})
+
+
+def test_subclass_overrides():
+    class Upper(Serializer):
+        def addString(self, obj):
+            Serializer.addString(self, obj.upper())
+
+    assert decodeTSON(Upper({"k": ["x", 1], "v": "y"}).getBytes().getvalue()) == {"K": ["X", 1], "V": "Y"}
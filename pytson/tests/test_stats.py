@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pytest
+
+import pytson.spec as spec
+from pytson import DeSerializer, Serializer, SerializerJsonIterator, TsonStats, encodeTSON, decodeTSON
+from pytson.serializer import encodeObject
+
+VERSION_SIZE = len(encodeObject(spec.TSON_SPEC_VERSION))
+
+DOCUMENT = {"s": ["x" * 9] * 9000, "n": np.arange(100, dtype=np.int32), "v": 1.5, "t": "text"}
+
+
+@pytest.mark.parametrize("mode", ["old", "new", "buffer"])
+@pytest.mark.parametrize("obj", [{"a": 1}, DOCUMENT])
+def test_decode_stats(mode, obj):
+    data = encodeTSON(obj).getvalue()
+    stats = TsonStats()
+    DeSerializer(data if mode == "buffer" else io.BytesIO(data), mode=mode, stats=stats)
+
+    summary = stats.summary()
+    # The top-level map is everything but the version
+    assert summary["map"]["count"] == 1
+    assert summary["map"]["bytes"] == len(data) - VERSION_SIZE
+    if mode != "buffer":
+        assert summary["io"]["reads"] > 0
+        assert summary["io"]["bytes_read"] == len(data)
+
+
+def test_encode_stats():
+    stats = TsonStats()
+    data = encodeTSON(DOCUMENT, stats=stats).getvalue()
+
+    summary = stats.summary()
+    assert summary["io"]["bytes_written"] == len(data)
+    assert summary["map"]["count"] == 1
+    assert summary["list_string"]["count"] == 1
+    assert summary["list_int32"]["bytes"] == 5 + 400
+    assert summary["double"]["count"] == 1
+    # The version and the four keys
+    assert summary["string"]["count"] == 6
+
+
+def test_iterator_stats():
+    stats = TsonStats()
+    chunks = list(SerializerJsonIterator(DOCUMENT, 1000, stats=stats))
+
+    summary = stats.summary()
+    assert summary["io"]["writes"] == len(chunks)
+    assert summary["io"]["bytes_written"] == sum(map(len, chunks))
+    assert summary["list_int32"]["bytes"] == 5 + 400
+
+
+def test_compressed_decode_stats():
+    stats = TsonStats()
+    data = encodeTSON(DOCUMENT, compression="zlib").getvalue()
+
+    decodeTSON(io.BytesIO(data), stats=stats)
+    assert stats.summary()["map"]["bytes"] == len(encodeTSON(DOCUMENT).getvalue()) - VERSION_SIZE
+
+
+def test_without_stats_is_plain():
+    s = Serializer({"a": 1})
+    assert "addString" not in s.__dict__
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pytson import TsonStreamDecoder, encodeTSON
+from pytson.error import TsonIncompleteError
+from pytson.tests import plain
+
+DOCUMENT = {
+    "id": 7,
+    "name": "gène",
+    "ints": list(range(1000)),
+    "array": np.arange(300, dtype=np.float64),
+    "strings": ["a", "bc", "é"] * 100,
+    "nested": {"a": [1, "b", None], "c": {"d": True}},
+    "last": 2.5,
+}
+
+
+def feedAll(data, size):
+    decoder = TsonStreamDecoder()
+    entries = []
+    for i in range(0, len(data), size):
+        entries += decoder.feed(data[i:i + size])
+    entries += decoder.close()
+    return entries
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1000, 1 << 20])
+def test_stream_decoder_chunks(size):
+    entries = feedAll(encodeTSON(DOCUMENT).getvalue(), size)
+
+    assert [k for k, _ in entries] == list(DOCUMENT)
+    assert plain(dict(entries)) == plain(DOCUMENT)
+
+
+@pytest.mark.parametrize("obj", [[1, "a", {"b": 2}], "text", None])
+def test_stream_decoder_not_map(obj):
+    assert plain(feedAll(encodeTSON(obj).getvalue(), 3)) == [(None, obj)]
+
+
+def test_stream_decoder_truncated():
+    data = encodeTSON(DOCUMENT).getvalue()
+    decoder = TsonStreamDecoder()
+    decoder.feed(data[:-1])
+
+    assert not decoder.isDone()
+    with pytest.raises(TsonIncompleteError):
+        decoder.close()
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from pytson import DeSerializer, encodeTSON
+from pytson.error import TsonIncompleteError
+
+STRINGS = ["", "a", "gène", "日本語", "x" * 1000] * 20
+
+
+class NonSeekable(io.RawIOBase):
+    # Raw stream over data which can neither seek nor peek
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.data.readinto(b)
+
+
+class CountingReader(io.BufferedReader):
+    # Buffered, not seekable, counting read() calls
+    reads = 0
+
+    def read(self, n=-1):
+        self.reads += 1
+        return io.BufferedReader.read(self, n)
+
+
+@pytest.mark.parametrize("mode", ["old", "new", "buffer"])
+def test_strings(mode):
+    obj = {"list": STRINGS, "scalars": list(STRINGS) + [1], "é": "ü"}
+    data = encodeTSON(obj).getvalue()
+    con = data if mode == "buffer" else io.BytesIO(data)
+
+    assert DeSerializer(con, mode=mode).getObject() == obj
+
+
+def test_buffered_stream_reads_in_bulk():
+    obj = {"key" + str(i): "value" + str(i) for i in range(1000)}
+    con = CountingReader(NonSeekable(encodeTSON(obj).getvalue()))
+
+    assert not con.seekable()
+    assert DeSerializer(con).getObject() == obj
+    # A read per string, type and length, rather than per byte
+    assert con.reads < 5000
+
+
+@pytest.mark.parametrize("wrap", [io.BytesIO, lambda data: io.BufferedReader(NonSeekable(data))])
+def test_truncated_string(wrap):
+    data = encodeTSON("text").getvalue()
+
+    with pytest.raises(TsonIncompleteError):
+        DeSerializer(wrap(data[:-1])).getObject()